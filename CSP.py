@@ -1,18 +1,60 @@
-class Node: 
-    def __init__(self, key, domain):
-        self.key = key
-        self.domain = domain # set domains, one for each variable
-        # domain is it's legal values
+from array import array
+
+def popcount(mask): # number of values left in a bitmask domain
+    return bin(mask).count("1")
+
+class Node:
+    def __init__(self, key, csp):
+        self.key = key # integer node id, index into csp.variables, csp.adjacency and csp.domains
+        self.id = key
+        self.csp = csp
+
+    # domain is it's legal values, stored as a bitmask in csp.domains (bit c set = color c allowed)
+    @property
+    def domain(self):
+        return self.csp.values(self)
+
+# a compiled instance (loader.py) is memory mapped, so its neighbor rows are made from the
+# (offsets, targets) arrays when first used instead of when the csp is built; they index
+# like the adjacency list of a text instance (a dict lookup once made) and iterate in node id order
+class LazyRows(dict): # neighbor nodes of each variable, read from the (offsets, targets) arrays
+    def __init__(self, variables, offsets, targets):
+        self.variables = variables
+        self.offsets = offsets
+        self.targets = targets
+
+    def __missing__(self, u):
+        if not 0 <= u < len(self.variables):
+            raise IndexError("node id {} outside 0 to {}".format(u, len(self.variables) - 1))
+        row = list(map(self.variables.__getitem__, self.targets[self.offsets[u]:self.offsets[u+1]].tolist()))
+        self[u] = row
+        return row
+
+    def __len__(self):
+        return len(self.variables)
+
+    def __iter__(self):
+        for u in range(len(self.variables)):
+            yield self[u]
 
 class CSP:
-    def __init__(self, n, m, k, constraints):
+    def __init__(self, n, m, k, edges, csr=None):
         self.n = int(n) # n variables
         self.m = int(m) # m constraints
         self.k = int(k) # k possible colors
         self.domain = self.set_domain()
+        self.full = (1 << self.k) - 1 # bitmask with every color allowed
+        self.domains = [self.full] * self.n # bitmask domain of each variable, indexed by node id
         self.variables = self.set_variables() # array of nodes
-        self.constraints = constraints
-    
+        self.edges = edges # constraints as a flat integer array u0 v0 u1 v1 ...
+        self.csr = csr # optional precomputed (offsets, targets) neighbor arrays, see loader.py
+        self.adjacency = self.set_adjacency() # array of neighbor nodes, indexed by node id
+        self.trail = [] # (node id, previous domain bitmask) for every domain change, undone in reverse order
+        self.reasons = None # when a dict: node id * k + value -> bitmask of the search depths that removed value (backjumping)
+        self.wipeout = None # node whose domain was emptied by the last failed propagation
+        self.stats = None # stats.Stats the solvers count into, None when not profiling
+        self.positions = None # constraint positions in edges, made by the first remove_constraint
+
     def set_domain(self):
         domain = []
         for color in range(self.k):
@@ -22,21 +64,200 @@ class CSP:
     def set_variables(self):
         variables = []
         for key in range(self.n):
-            node = Node(str(key), self.domain)
+            node = Node(key, self)
             variables.append(node)
         return variables
 
+    def set_adjacency(self):
+        # built once, so a neighbor lookup costs O(degree) instead of a scan over every constraint
+        # one entry per constraint, in input order (same as scanning the constraints list)
+        # a compiled instance keeps its (offsets, targets) arrays, rows are made when first used
+        variables = self.variables
+        if self.csr is not None:
+            offsets, targets = self.csr
+            return LazyRows(variables, offsets, targets)
+        adjacency = [[] for _ in range(self.n)]
+        edges = self.edges
+        for i in range(0, len(edges), 2):
+            u = edges[i]
+            v = edges[i+1]
+            adjacency[u].append(variables[v])
+            if u != v:
+                adjacency[v].append(variables[u])
+        return adjacency
+
+    @property
+    def constraints(self): # (u, v) pairs, generated from the edge array
+        edges = self.edges
+        return list(zip(edges[0::2], edges[1::2]))
+
+    def set_colors(self, k): # change K in place, every domain back to all K colors (see chromatic.py)
+        self.k = int(k)
+        self.domain = self.set_domain()
+        self.full = (1 << self.k) - 1
+        self.domains = [self.full] * self.n
+        self.trail = []
+        self.reasons = None
+
+    # constraint changes, for incremental re-solving (see incremental.py)
+    # O(degree) each; the first removal indexes the position of every constraint, O(M) once
+    # a removed constraint is replaced by the last one in the edge array, so the edge order changes
+    def add_constraint(self, u, v):
+        if not (0 <= u < self.n and 0 <= v < self.n):
+            raise ValueError("constraint ({} {}) names a variable outside 0 to {}".format(u, v, self.n - 1))
+        edges = self.own_edges()
+        if self.positions is not None:
+            self.put_position(self.constraint_key(u, v), len(edges) // 2)
+        edges.append(u)
+        edges.append(v)
+        self.m += 1
+        self.adjacency[u].append(self.variables[v])
+        if u != v:
+            self.adjacency[v].append(self.variables[u])
+
+    def remove_constraint(self, u, v): # removes one constraint between u and v, in either direction
+        if self.positions is None:
+            self.index_constraints()
+        edges = self.own_edges()
+        position = self.take_position(self.constraint_key(u, v))
+        if position is None:
+            raise ValueError("no constraint ({} {})".format(u, v))
+        last = len(edges) // 2 - 1
+        if position != last: # the last constraint fills the hole
+            a = edges[2 * last]
+            b = edges[2 * last + 1]
+            edges[2 * position] = a
+            edges[2 * position + 1] = b
+            key = self.constraint_key(a, b)
+            self.drop_position(key, last)
+            self.put_position(key, position)
+        del edges[2 * last:]
+        self.m -= 1
+        self.remove_neighbor(u, v)
+        if u != v:
+            self.remove_neighbor(v, u)
+
+    def own_edges(self): # the edge array, copied first if it is a read-only view of a compiled sidecar
+        if not isinstance(self.edges, array) or self.edges.typecode != 'i':
+            self.edges = array('i', self.edges)
+        self.csr = None # no longer matches the edges once they change
+        return self.edges
+
+    def constraint_key(self, u, v): # same key for (u v) and (v u)
+        if u <= v:
+            return u * self.n + v
+        return v * self.n + u
+
+    def index_constraints(self):
+        # self.positions: constraint key -> position of the constraint in the edge array,
+        # a list of positions for a constraint given more than once
+        self.positions = {}
+        edges = self.edges
+        for position, (u, v) in enumerate(zip(edges[0::2], edges[1::2])):
+            self.put_position(self.constraint_key(u, v), position)
+
+    def put_position(self, key, position):
+        positions = self.positions
+        old = positions.get(key)
+        if old is None:
+            positions[key] = position
+        elif isinstance(old, list):
+            old.append(position)
+        else:
+            positions[key] = [old, position]
+
+    def take_position(self, key): # removes and returns one position of key, None if there is none
+        positions = self.positions
+        old = positions.get(key)
+        if old is None:
+            return None
+        if not isinstance(old, list):
+            del positions[key]
+            return old
+        position = old.pop()
+        if len(old) == 1:
+            positions[key] = old[0]
+        return position
+
+    def drop_position(self, key, position): # removes the given position of key
+        positions = self.positions
+        old = positions[key]
+        if not isinstance(old, list):
+            del positions[key]
+            return
+        old.remove(position)
+        if len(old) == 1:
+            positions[key] = old[0]
+
+    def remove_neighbor(self, u, v): # one occurrence of v in the neighbors of u
+        neighbors = self.adjacency[u]
+        for i in range(len(neighbors)):
+            if neighbors[i].id == v:
+                del neighbors[i]
+                return
+
     def get_node(self, key):
-        for node in self.variables:
-            if (node.key == key):
-                return node
+        id = int(key)
+        if 0 <= id < self.n:
+            return self.variables[id]
         return False
-    
+
     def get_neighbors(self, node):
-        neighbors = []
-        for constraint in self.constraints:
-            if (node.key in constraint):
-                neighbor_key = constraint[constraint.index(node.key)-1]
-                neighbor_node = self.get_node(neighbor_key)
-                neighbors.append(neighbor_node)
-        return neighbors
\ No newline at end of file
+        return self.adjacency[node.id]
+
+    # bitmask domain queries, O(1) for the small K of graph coloring
+    def has(self, node, value): # value still in the domain of node
+        return (self.domains[node.id] >> value) & 1 == 1
+
+    def size(self, node): # number of values left in the domain of node
+        return popcount(self.domains[node.id])
+
+    def values(self, node): # values left in the domain of node, in increasing order
+        mask = self.domains[node.id]
+        return [value for value in range(self.k) if (mask >> value) & 1]
+
+    # domain changes made during search go through the trail,
+    # so a failed branch can undo exactly the prunings made since its checkpoint
+    def checkpoint(self):
+        return len(self.trail)
+
+    def prune(self, node, value, reason=0): # remove value from the domain of node
+        self.trail.append((node.id, self.domains[node.id]))
+        self.domains[node.id] &= ~(1 << value)
+        if self.reasons is not None:
+            self.reasons[node.id * self.k + value] = reason
+
+    def reduce(self, node, value, reason=0): # reduce the domain of node to the single value
+        mask = self.domains[node.id]
+        self.trail.append((node.id, mask))
+        self.domains[node.id] = 1 << value
+        if self.reasons is not None:
+            base = node.id * self.k
+            for other in range(self.k):
+                if other != value and (mask >> other) & 1:
+                    self.reasons[base + other] = reason
+
+    def explain(self, node):
+        # search depths responsible for the current domain of node, the union of the
+        # reasons of its removed values (a reason is only read while its value is removed)
+        mask = self.domains[node.id]
+        reasons = self.reasons
+        base = node.id * self.k
+        reason = 0
+        for value in range(self.k):
+            if not (mask >> value) & 1:
+                reason |= reasons.get(base + value, 0)
+        return reason
+
+    def changed_since(self, checkpoint): # nodes whose domains changed since checkpoint
+        ids = set()
+        for id, mask in self.trail[checkpoint:]:
+            ids.add(id)
+        return [self.variables[id] for id in ids]
+
+    def undo(self, checkpoint): # restore every domain changed since checkpoint
+        trail = self.trail
+        domains = self.domains
+        while len(trail) > checkpoint:
+            id, mask = trail.pop()
+            domains[id] = mask
@@ -1,5 +1,7 @@
 import sys
 import random
+from array import array
+from loader import write_binary
 # random.seed(0)
 
 def CSPGenerator(N, M, K, output_file_path):
@@ -34,27 +36,89 @@ def CSPGenerator(N, M, K, output_file_path):
                 f.write('\n{} {}'.format(csp[0], csp[1]))
     return True
 
+def FastCSPGenerator(N, M, K, output_file_path, binary=False):
+    # same planted-solution instances as CSPGenerator, without the list of every valid pair:
+    # edges are drawn by rejection sampling, uniform over the distinct pairs with different colors,
+    # and written in one go (text, or the binary CSR format of loader.py when binary is set)
+    colors = [random.randrange(K) for i in range(N)]
+    sizes = [0] * K
+    for c in colors:
+        sizes[c] += 1
+    valid = (N * N - sum(size * size for size in sizes)) // 2 # number of pairs with different colors
+    if valid < M:
+        return False
+
+    edges = array('i')
+    if 2 * M > valid:
+        # dense: most valid pairs are used, so listing them costs O(M)
+        variables_by_color = [[] for c in range(K)]
+        for v in range(N):
+            variables_by_color[colors[v]].append(v)
+        valid_csps = [(var1, var2) for c1 in range(K) for c2 in range(c1 + 1, K)
+                      for var1 in variables_by_color[c1] for var2 in variables_by_color[c2]]
+        for var1, var2 in random.sample(valid_csps, M):
+            edges.append(var1)
+            edges.append(var2)
+    else:
+        seen = set()
+        while len(seen) < M:
+            u = random.randrange(N)
+            v = random.randrange(N)
+            if colors[u] == colors[v]:
+                continue
+            if colors[u] > colors[v]: # lower color first, like CSPGenerator
+                u, v = v, u
+            pair = u * N + v
+            if pair in seen:
+                continue
+            seen.add(pair)
+            edges.append(u)
+            edges.append(v)
+
+    write_instance(N, M, K, edges, output_file_path, binary)
+    return True
+
+def write_instance(N, M, K, edges, output_file_path, binary=False):
+    # edges is a flat array u0 v0 u1 v1 ...
+    if binary:
+        write_binary(output_file_path, N, M, K, edges)
+        return
+    with open(output_file_path, 'w') as f:
+        f.write('{} {} {}'.format(N, M, K))
+        if M > 0:
+            f.write('\n')
+            f.write('\n'.join(map('{} {}'.format, edges[0::2], edges[1::2])))
+
 if __name__ == "__main__":
+    # python CSPGenerator.py N M K <OUTPUT FILE> [<SOLVABLE FLAG>] [<GENERATOR FLAG>]
+    # <GENERATOR FLAG> 0: list every valid pair (default), 1: sampled edges, text output,
+    # 2: sampled edges, binary output (see loader.py)
     N = int(sys.argv[1])
     M = int(sys.argv[2])
     K = int(sys.argv[3])
     output_file_path = sys.argv[4]
     solvable = 1
 
+    generator = 0
+
     if len(sys.argv) > 5:
         solvable = int(sys.argv[5])
+    if len(sys.argv) > 6:
+        generator = int(sys.argv[6])
 
     if solvable == 0:
-        with open(output_file_path, 'w') as f:
-            f.write('{} {} {}'.format(N, M, K))
-            for m in range(M):
-                csp = random.sample(range(N), 2)
-                f.write('\n{} {}'.format(csp[0], csp[1]))
+        edges = array('i')
+        for m in range(M):
+            edges.extend(random.sample(range(N), 2))
+        write_instance(N, M, K, edges, output_file_path, generator == 2)
     else:
         trial = 1000
 
         for t in range(trial):
-            status = CSPGenerator(N, M, K, output_file_path)
+            if generator == 0:
+                status = CSPGenerator(N, M, K, output_file_path)
+            else:
+                status = FastCSPGenerator(N, M, K, output_file_path, generator == 2)
             if status:
                 break
 
@@ -0,0 +1,87 @@
+import sys
+import datetime
+import dfsb
+import minconflicts
+from budget import Budget
+from stats import Stats
+from loader import input_to_csp
+
+# -------------------------------------------------------
+# anytime solving: every engine under one wall-clock and node/step budget
+# solve(csp, engine, seconds, nodes, callback) returns
+#   (solution or False, best partial assignment, progress report)
+# the best partial assignment is the largest consistent partial coloring for DFS-B,
+# and the complete coloring with the fewest conflicts for min-conflicts
+# min-conflicts never proves there is no solution, it runs until the budget is spent
+# -------------------------------------------------------
+
+def run_numpy(csp, budget):
+    import minconflicts_numpy # numpy is optional
+    return minconflicts_numpy.min_conflicts_solver(csp, budget=budget)
+
+# engine name -> solver(csp, budget)
+ENGINES = {
+    "plain": lambda csp, budget: dfsb.plain_backtracking_search(csp, budget=budget),
+    "improved": lambda csp, budget: dfsb.improved_backtracking_search(csp, budget=budget),
+    "improved-parallel": lambda csp, budget: dfsb.parallel_backtracking_search(csp, budget=budget),
+    "minconflicts": lambda csp, budget: minconflicts.min_conflicts_solver(csp, budget=budget),
+    "minconflicts-tabu": lambda csp, budget: minconflicts.min_conflicts_solver(csp, minconflicts.TABU_OPTIONS, budget),
+    "minconflicts-parallel": lambda csp, budget: minconflicts.parallel_min_conflicts_solver(csp, budget=budget),
+    "minconflicts-numpy": run_numpy,
+}
+
+def solve(csp, engine="improved", seconds=None, nodes=None, callback=None, interval=1.0):
+    # callback(progress) is called about every interval seconds with a dict of
+    # elapsed seconds, states (DFS-B nodes or min-conflicts steps), best conflicts and unassigned variables
+    budget = Budget(seconds, nodes, callback, interval)
+    # the reported states are the engine's own count (stats.nodes), the budget only sees
+    # the nodes it was charged for, not the root or the last descent
+    stats = csp.stats
+    if stats is None:
+        csp.stats = Stats()
+    first = csp.stats.nodes
+    try:
+        assignment = ENGINES[engine](csp, budget)
+    finally:
+        states = csp.stats.nodes - first
+        csp.stats = stats
+    if assignment:
+        budget.improve(assignment)
+        status = "solved"
+    elif budget.exhausted:
+        status = "budget"
+    else:
+        status = "unsatisfiable"
+    report = budget.progress()
+    report["states"] = states
+    report["engine"] = engine
+    report["status"] = status
+    return assignment, budget.best, report
+
+def print_progress(progress):
+    print("{elapsed:.2f}s states {states} conflicts {conflicts} unassigned {unassigned}".format(**progress))
+
+### Main class ###
+
+if __name__ == '__main__':
+    # python anytime.py <INPUT FILE> <OUTPUT FILE> <ENGINE> [<SECONDS>] [<NODES>]
+    # <ENGINE>: plain, improved, improved-parallel, minconflicts, minconflicts-tabu, minconflicts-parallel or minconflicts-numpy
+    # <SECONDS> and <NODES> limit the wall-clock time and the states / steps, 0 for no limit
+    input = (sys.argv[1]) # INPUT FILE PATH
+    output = (sys.argv[2]) # OUTPUT FILE PATH
+    engine = (sys.argv[3]) # ENGINE
+    seconds = float(sys.argv[4]) if len(sys.argv) > 4 and float(sys.argv[4]) > 0 else None
+    nodes = int(sys.argv[5]) if len(sys.argv) > 5 and int(sys.argv[5]) > 0 else None
+
+    start = datetime.datetime.now()
+
+    csp = input_to_csp(input)
+    assignment, best, report = solve(csp, engine, seconds, nodes, print_progress)
+    print(report)
+
+    # write to output file, "No answer" unless the coloring is a solution
+    minconflicts.write_output(assignment, output)
+
+    end = datetime.datetime.now()
+    time_elapsed = (end - start)
+    print("time elapsed", time_elapsed)
@@ -0,0 +1,184 @@
+import io
+import os
+import csv
+import json
+import math
+import random
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+import datetime
+import dfsb
+import minconflicts
+from CSPGenerator import CSPGenerator
+from loader import input_to_csp
+try:
+    import minconflicts_numpy
+except ImportError: # numpy is optional
+    minconflicts_numpy = None
+
+# -------------------------------------------------------
+# benchmark harness
+# generates seeded instances with CSPGenerator over a grid of N/M/K,
+# runs each selected engine on them and reports wall time, states / steps
+# and peak memory (mean, sd, percentiles), written as JSON or CSV
+#
+# python benchmark.py [--grid N:M:K ...] [--engines plain improved minconflicts]
+#                     [--repeats R] [--seed S] [--output results.json|results.csv] [--no-memory]
+# -------------------------------------------------------
+
+# instance sizes used for the report, K = 4
+DEFAULT_GRID = [(20, 100, 4), (50, 625, 4), (100, 2500, 4), (200, 10000, 4), (400, 40000, 4)]
+
+# engine name -> function(csp) returning (assignment, states or steps)
+def run_plain(csp):
+    assignment = dfsb.plain_backtracking_search(csp)
+    return assignment, dfsb.states
+
+def run_improved(csp):
+    assignment = dfsb.improved_backtracking_search(csp)
+    return assignment, dfsb.states
+
+def run_min_conflicts(csp):
+    minconflicts.steps = 0
+    assignment = minconflicts.min_conflicts_solver(csp)
+    return assignment, minconflicts.steps
+
+def run_min_conflicts_tabu(csp):
+    minconflicts.steps = 0
+    assignment = minconflicts.min_conflicts_solver(csp, minconflicts.TABU_OPTIONS)
+    return assignment, minconflicts.steps
+
+def run_min_conflicts_numpy(csp):
+    minconflicts_numpy.steps = 0
+    assignment = minconflicts_numpy.min_conflicts_solver(csp)
+    return assignment, minconflicts_numpy.steps
+
+ENGINES = {
+    "plain": run_plain,
+    "improved": run_improved,
+    "minconflicts": run_min_conflicts,
+    "minconflicts-tabu": run_min_conflicts_tabu,
+}
+if minconflicts_numpy:
+    ENGINES["minconflicts-numpy"] = run_min_conflicts_numpy
+
+def generate(n, m, k, seed, file):
+    # seeded CSPGenerator instance, retried like the CSPGenerator.py driver
+    random.seed(seed)
+    for t in range(1000):
+        if CSPGenerator(n, m, k, file):
+            return True
+    return False
+
+def run_engine(engine, file, seed, memory):
+    # one trial: a timed run, then (optionally) the same seeded run again under tracemalloc for peak memory
+    # the solvers' progress output is discarded
+    with contextlib.redirect_stdout(io.StringIO()):
+        csp = input_to_csp(file)
+        random.seed(seed)
+        start = datetime.datetime.now()
+        assignment, count = ENGINES[engine](csp)
+        seconds = (datetime.datetime.now() - start).total_seconds()
+        peak = None
+        if memory:
+            csp = input_to_csp(file)
+            random.seed(seed)
+            tracemalloc.start()
+            ENGINES[engine](csp)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {"seconds": seconds, "count": count, "peak_bytes": peak, "solved": bool(assignment)}
+
+def percentile(values, p): # linear interpolation between closest ranks
+    values = sorted(values)
+    if len(values) == 1:
+        return values[0]
+    rank = (len(values) - 1) * p / 100.0
+    low = int(math.floor(rank))
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+def summarize(values):
+    if not values:
+        return None
+    mean = sum(values) / len(values)
+    sd = 0.0
+    if len(values) > 1:
+        sd = math.sqrt(sum([(val - mean)**2 for val in values])/(len(values) - 1))
+    return {"mean": mean, "sd": sd, "min": min(values), "p50": percentile(values, 50),
+            "p90": percentile(values, 90), "p99": percentile(values, 99), "max": max(values)}
+
+def benchmark(grid, engines, repeats, seed, memory=True):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, "instance")
+        for n, m, k in grid:
+            samples = {engine: [] for engine in engines}
+            for trial in range(repeats):
+                trial_seed = seed + trial
+                if not generate(n, m, k, trial_seed, file):
+                    print("failed to create csp for", n, m, k)
+                    break
+                # the solvers get their own seed, reusing the generator's would replay the planted coloring
+                solve_seed = "solve {}".format(trial_seed)
+                for engine in engines:
+                    samples[engine].append(run_engine(engine, file, solve_seed, memory))
+            for engine in engines:
+                runs = samples[engine]
+                results.append({
+                    "engine": engine, "n": n, "m": m, "k": k, "repeats": len(runs),
+                    "solved": sum(1 for run in runs if run["solved"]),
+                    "seconds": summarize([run["seconds"] for run in runs]),
+                    "count": summarize([run["count"] for run in runs]),
+                    "peak_bytes": summarize([run["peak_bytes"] for run in runs if run["peak_bytes"] is not None]),
+                    "runs": runs,
+                })
+                print_result(results[-1])
+    return results
+
+def print_result(result):
+    seconds = result["seconds"]
+    count = result["count"]
+    line = "{engine:>12} N={n} M={m} K={k} solved {solved}/{repeats}".format(**result)
+    if seconds:
+        line += " time {:.4f}s (sd {:.4f}, p90 {:.4f})".format(seconds["mean"], seconds["sd"], seconds["p90"])
+        line += " states/steps {:.1f} (sd {:.1f})".format(count["mean"], count["sd"])
+    if result["peak_bytes"]:
+        line += " peak {:.1f} KiB".format(result["peak_bytes"]["mean"] / 1024.0)
+    print(line)
+
+def write_results(results, file):
+    if file.endswith(".csv"):
+        with open(file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["engine", "n", "m", "k", "repeats", "solved", "metric", "mean", "sd", "min", "p50", "p90", "p99", "max"])
+            for result in results:
+                for metric in ["seconds", "count", "peak_bytes"]:
+                    stats = result[metric]
+                    if stats is None:
+                        continue
+                    writer.writerow([result["engine"], result["n"], result["m"], result["k"], result["repeats"], result["solved"], metric,
+                                     stats["mean"], stats["sd"], stats["min"], stats["p50"], stats["p90"], stats["p99"], stats["max"]])
+    else:
+        with open(file, "w") as f:
+            json.dump(results, f, indent=2)
+
+def parse_grid(text): # "N:M:K"
+    n, m, k = text.split(":")
+    return int(n), int(m), int(k)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark the csp solvers on generated instances")
+    parser.add_argument("--grid", nargs="+", type=parse_grid, default=DEFAULT_GRID, help="instance sizes as N:M:K")
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES), default=["improved", "minconflicts"])
+    parser.add_argument("--repeats", type=int, default=5, help="instances (and runs) per grid point")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json", help="results file, .json or .csv")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc peak memory run")
+    args = parser.parse_args()
+
+    results = benchmark(args.grid, args.engines, args.repeats, args.seed, args.memory)
+    write_results(results, args.output)
+    print("results written to", args.output)
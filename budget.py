@@ -0,0 +1,74 @@
+import time
+
+# -------------------------------------------------------
+# wall-clock and node/step budgets for the solvers (anytime solving)
+# an engine calls budget.spend() once per search node or min-conflicts step;
+# the clock is only read every `check` calls, so a budget costs one method call per node
+# the engine hands its best partial assignment so far to budget.improve(...),
+# it is kept after the budget runs out
+# -------------------------------------------------------
+
+class Budget:
+    def __init__(self, seconds=None, nodes=None, callback=None, interval=1.0, check=256):
+        self.seconds = seconds # wall-clock limit, None for no limit
+        self.nodes = nodes # limit on search nodes (DFS-B states) or min-conflicts steps, None for no limit
+        self.callback = callback # callback(progress()) about every interval seconds
+        self.interval = interval
+        self.check = check # calls to spend between two reads of the clock
+        self.start = time.perf_counter()
+        self.count = 0 # nodes or steps spent
+        self.next_check = self.limit(check)
+        self.next_report = self.start + interval
+        self.exhausted = None # None, "time" or "nodes" once the budget has run out
+        self.best = None # best partial assignment found so far
+        self.best_conflicts = None # sum of the per-variable conflicts of best
+        self.best_unassigned = None # number of variables best leaves unassigned
+
+    def limit(self, count): # next count at which spend has to look at the budget
+        if self.nodes is not None:
+            return min(count, self.nodes)
+        return count
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def spend(self, count=1): # False once the budget has run out
+        self.count += count
+        if self.count < self.next_check:
+            return True
+        return self.tick()
+
+    def tick(self):
+        now = time.perf_counter()
+        if self.nodes is not None and self.count >= self.nodes:
+            self.exhausted = "nodes"
+        elif self.seconds is not None and now - self.start >= self.seconds:
+            self.exhausted = "time"
+        if self.callback and now >= self.next_report:
+            self.callback(self.progress())
+            self.next_report = now + self.interval
+        self.next_check = self.limit(self.count + self.check)
+        return self.exhausted is None
+
+    def better(self, conflicts=0, unassigned=0): # would such a partial assignment improve on the best
+        if self.best is None:
+            return True
+        return (unassigned, conflicts) < (self.best_unassigned, self.best_conflicts)
+
+    def improve(self, assignment, conflicts=0, unassigned=0):
+        # keeps a copy of assignment if it is better than the best so far
+        if self.better(conflicts, unassigned):
+            self.best = dict(assignment)
+            self.best_conflicts = conflicts
+            self.best_unassigned = unassigned
+            return True
+        return False
+
+    def progress(self):
+        return {
+            "elapsed": self.elapsed(),
+            "states": self.count,
+            "conflicts": self.best_conflicts,
+            "unassigned": self.best_unassigned,
+            "exhausted": self.exhausted,
+        }
@@ -0,0 +1,209 @@
+import io
+import sys
+import time
+import heapq
+import datetime
+import contextlib
+import dfsb
+import minconflicts
+from budget import Budget
+from loader import input_to_csp, write_solution
+from minconflicts import ConflictTable
+from preprocess import distinct_neighbors, greedy_clique
+
+# -------------------------------------------------------
+# chromatic number: the smallest K for which the instance has a solution
+# (the K of the input header is ignored)
+# 1. lower bound: a clique found by preprocess.greedy_clique needs one color per variable
+# 2. upper bound: the number of colors of a DSATUR greedy coloring
+# 3. K is tightened one color at a time on the same csp (no re-parsing): the best coloring
+#    with K + 1 colors, its smallest color class recolored, seeds min-conflicts (tabu search)
+#    with K colors; when that fails improved DFS-B decides K exactly, with the clique
+#    variables fixed to colors 0 to clique size - 1 and propagated before the search
+#    a K without a solution proves the best coloring so far optimal
+#
+# python chromatic.py <INPUT FILE> <OUTPUT FILE> [<SECONDS>]
+# prints every bound change, writes the coloring with the fewest colors found
+# -------------------------------------------------------
+
+def dsatur(csp, neighbors):
+    # DSATUR greedy coloring: the next variable is the one with the most distinct colors
+    # among its neighbors (saturation), ties to the highest degree, colored with its lowest free color
+    n = csp.n
+    colors = [-1] * n
+    seen = [set() for _ in range(n)] # colors of the colored neighbors of each variable
+    degree = [len(ids) for ids in neighbors]
+    heap = [(0, -degree[v], v) for v in range(n)]
+    heapq.heapify(heap)
+    while heap:
+        saturation, d, v = heapq.heappop(heap)
+        if colors[v] >= 0 or -saturation != len(seen[v]): # colored, or a stale entry
+            continue
+        color = 0
+        while color in seen[v]:
+            color += 1
+        colors[v] = color
+        for u in neighbors[v]:
+            if colors[u] < 0 and color not in seen[u]:
+                seen[u].add(color)
+                heapq.heappush(heap, (-len(seen[u]), -degree[u], u))
+    return colors
+
+def drop_color(colors, k, neighbors):
+    # a coloring with k colors -> a seed with k - 1 colors: the smallest color class is
+    # moved to the top color, then each of its variables takes its least conflicting lower color
+    sizes = [0] * k
+    for color in colors:
+        sizes[color] += 1
+    smallest = sizes.index(min(sizes))
+    top = k - 1
+    seed = list(colors)
+    for v in range(len(seed)):
+        if seed[v] == smallest:
+            seed[v] = top
+        elif seed[v] == top:
+            seed[v] = smallest
+    for v in range(len(seed)):
+        if seed[v] == top:
+            counts = [0] * top
+            for u in neighbors[v]:
+                if seed[u] < top:
+                    counts[seed[u]] += 1
+            seed[v] = counts.index(min(counts))
+    return seed
+
+class Bounds:
+    # best bounds so far, handed to callback(progress()) whenever they change
+    # and about every interval seconds during a search
+    def __init__(self, callback=None):
+        self.lower = 0
+        self.upper = None
+        self.colors = None # coloring with upper colors
+        self.k = None # K being tried
+        self.method = None # how the last bound was found
+        self.callback = callback
+        self.stdout = sys.stdout # the callback prints here, not into the quieted solver output
+        self.start = time.perf_counter()
+
+    def found(self, k, colors, method):
+        self.upper = k
+        self.colors = list(colors)
+        self.method = method
+        self.report()
+
+    def proved(self, lower, method):
+        self.lower = lower
+        self.method = method
+        self.report()
+
+    def report(self, search=None): # search: the budget.progress() of the running search
+        if self.callback:
+            with contextlib.redirect_stdout(self.stdout):
+                self.callback(self.progress(search))
+
+    def progress(self, search=None):
+        progress = {
+            "elapsed": time.perf_counter() - self.start,
+            "lower": self.lower, "upper": self.upper, "k": self.k, "method": self.method,
+        }
+        if search is not None:
+            progress["states"] = search["states"]
+        return progress
+
+def remaining(seconds, bounds): # seconds left of the total budget, None for no limit
+    if seconds is None:
+        return None
+    return max(0.0, seconds - (time.perf_counter() - bounds.start))
+
+def try_local(csp, seed, steps, seconds, bounds):
+    # min-conflicts with K = csp.k colors from the seed coloring, the solution colors or None
+    table = ConflictTable(csp, seed)
+    budget = Budget(remaining(seconds, bounds), None, bounds.report)
+    state = {}
+    if minconflicts.min_conflicts(csp, steps, state, minconflicts.TABU_OPTIONS, table, budget):
+        return table.colors
+    return None
+
+def try_exact(csp, clique, seconds, bounds):
+    # improved DFS-B with K = csp.k colors, returns (solution colors or None, proved there is none)
+    for color, v in enumerate(clique): # any coloring can be renamed to give the clique these colors
+        csp.domains[v] = 1 << color
+    if not dfsb.mac3(csp, [csp.variables[v] for v in clique]):
+        return None, True
+    budget = Budget(remaining(seconds, bounds), None, bounds.report)
+    assignment = dfsb.improved_backtracking_search(csp, budget=budget)
+    if assignment:
+        return [assignment[v] for v in range(csp.n)], False
+    return None, budget.exhausted is None
+
+def chromatic_number(csp, seconds=None, steps=None, callback=None, quiet=True):
+    # returns (number of colors, coloring as a list of colors or None, report)
+    # seconds limits the whole run; steps is the min-conflicts budget per K, 20 N + 1000 by default
+    # callback(progress) gets the best bounds so far (lower, upper), at every change and
+    # about every second of a search; report["status"] is "optimal", "budget" or "unsatisfiable"
+    if steps is None:
+        steps = 20 * csp.n + 1000
+    bounds = Bounds(callback)
+    neighbors = distinct_neighbors(csp)
+    loops = [v for v in range(csp.n) if v in neighbors[v]]
+    if loops: # no number of colors works
+        return None, None, {"status": "unsatisfiable", "lower": None, "upper": None}
+    clique = greedy_clique(range(csp.n), neighbors)
+    bounds.proved(len(clique), "clique")
+    colors = dsatur(csp, neighbors)
+    bounds.found(max(colors) + 1 if colors else 0, colors, "dsatur")
+
+    output = io.StringIO() if quiet else sys.stdout # the solvers print their state counts
+    with contextlib.redirect_stdout(output):
+        while bounds.lower < bounds.upper:
+            if seconds is not None and remaining(seconds, bounds) <= 0:
+                break
+            k = bounds.upper - 1
+            bounds.k = k
+            csp.set_colors(k)
+            seed = drop_color(bounds.colors, bounds.upper, neighbors)
+            colors = try_local(csp, seed, steps, seconds, bounds)
+            if colors is not None:
+                bounds.found(k, colors, "minconflicts")
+                continue
+            csp.set_colors(k)
+            colors, none = try_exact(csp, clique, seconds, bounds)
+            if colors is not None:
+                bounds.found(k, colors, "dfsb")
+            elif none:
+                bounds.proved(k + 1, "dfsb")
+            else:
+                break # out of time
+
+    bounds.k = None
+    csp.set_colors(bounds.upper)
+    status = "optimal" if bounds.lower == bounds.upper else "budget"
+    report = bounds.progress()
+    report["status"] = status
+    return bounds.upper, bounds.colors, report
+
+def print_progress(progress):
+    line = "{elapsed:.2f}s {lower} <= colors <= {upper} ({method})".format(**progress)
+    if "states" in progress:
+        line += ", trying {k}: {states} states".format(**progress)
+    print(line)
+
+### Main class ###
+
+if __name__ == '__main__':
+    input = (sys.argv[1]) # INPUT FILE PATH
+    output = (sys.argv[2]) # OUTPUT FILE PATH
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 and float(sys.argv[3]) > 0 else None # TIME LIMIT
+
+    start = datetime.datetime.now()
+
+    csp = input_to_csp(input)
+    k, colors, report = chromatic_number(csp, seconds, callback=print_progress)
+    print(report)
+
+    # write to output file, "No answer" when no number of colors works
+    write_solution(colors, output)
+
+    end = datetime.datetime.now()
+    time_elapsed = (end - start)
+    print("time elapsed", time_elapsed)
@@ -1,8 +1,16 @@
+import io
+import os
 import sys
-from CSP import CSP
+import heapq
+import queue
+import contextlib
+from collections import deque, OrderedDict
+from loader import input_to_csp, write_solution
+from minconflicts import pool_context
+from CSP import popcount
+from budget import Budget
 import datetime
-from CSPGenerator import CSPGenerator
-import math
+from stats import Stats, profile_flags, run_profiled
 
 # -------------------------------------------------------
 # Sources used:
@@ -29,26 +37,6 @@ def get_unassigned(csp, assignment):
                 unassigned.append(var)
         return unassigned
 
-# input file format
-# N variables, numbered 0 to N-1
-# M constraints connecting them
-# K possible colors for each of variables
-# then on each following line, give constraints one by one, U and V
-def input_to_csp(file):
-    f = open(file)
-    line = f.readline().strip('\n')
-    first = line.split()
-    n = first[0]
-    m = first[1]
-    k = first[2]
-    constraints = []
-    for line in f:
-        line = line.strip('\n')
-        c = line.split()
-        constraints.append((c[0], c[1]))
-    csp = CSP(n, m, k, constraints)
-    return csp
-
 # -------------------------------------------------------
 ### DFS-B methods (for both) ###
 
@@ -74,31 +62,88 @@ def plain_select_unassigned_variable(assignment, csp):
 def plain_order_domain_values(var, assignment, csp):
     # Primitive operation, ordering the domain values of the specified variable. 
     # This default implementation just takes the default order provided by the CSP.
-    return var.domain
+    return csp.values(var)
 
-def plain_backtracking_search(csp):
+def plain_backtracking_search(csp, options=None, budget=None):
     # plain DFS, traverse the node tree depth first order
     # if current node doesn't satisfy constraints, skip node and it's children
+    # (only options.symmetry applies to the plain search)
+    # budget (budget.Budget), when given, stops the search once it runs out and keeps
+    # the largest consistent partial assignment seen in budget.best
+    if options is None:
+        options = SearchOptions()
     global states
     states = 0
-    return plain_recursive_backtracking({}, csp)
-
-def plain_recursive_backtracking(assignment, csp): # returns solution or failure
+    result = plain_iterative_backtracking({}, csp, options, budget)
+    if csp.stats is not None:
+        csp.stats.nodes += states
+    return result
+
+def color_usage(csp, assignment): # used[c] = number of assigned variables with color c
+    used = [0] * csp.k
+    for key in assignment:
+        used[assignment[key]] += 1
+    return used
+
+def break_symmetry(values, used):
+    # colors are interchangeable, so only the colors already in use and the lowest unused color
+    # need to be tried: any other unused color gives an equivalent subtree
+    lowest = used.index(0) if 0 in used else None
+    return [value for value in values if used[value] or value == lowest]
+
+def plain_iterative_backtracking(assignment, csp, options, budget=None):
+    # backtracking search with an explicit stack instead of recursion (no recursion limit for large N)
+    # each frame is [var, values, index of the next value]; the first unassigned variable,
+    # its values in domain order, a value is tried when it is consistent with the assignment
     global states
     states += 1
-    if is_complete(assignment, csp): # if assignment is complete, return assignment (like goal test)
+    if is_complete(assignment, csp):
         print(states)
         global states_list
         states_list.append(states)
         return assignment
-    var = plain_select_unassigned_variable(assignment, csp) # var <- select_unassigned_variable(variables[csp],assignment,csp)
-    for value in plain_order_domain_values(var, assignment, csp): # given the variable (var) that we have, explore all possible values that you can assign
-        if consistent(var, value, assignment, csp): # if value is consistent with assignment given constraints[csp] then
-            assignment[var.key] = value # add {var = value} to assignment
-            result = plain_recursive_backtracking(assignment, csp)
-            if (result): # if result not equal failure then return result
-                return result
-            assignment.pop(var.key, None) # remove {var = value} from assignment
+    stack = [None] * (csp.n + 1) # every frame assigns a variable, so depth <= n
+    used = color_usage(csp, assignment) if options.symmetry else None
+    var = plain_select_unassigned_variable(assignment, csp)
+    values = plain_order_domain_values(var, assignment, csp)
+    if used is not None:
+        values = break_symmetry(values, used)
+    stack[0] = [var, values, 0]
+    depth = 1
+    while depth:
+        frame = stack[depth-1]
+        var, values, i = frame
+        old = assignment.pop(var.key, None) # remove the previous {var = value} from assignment
+        if used is not None and old is not None:
+            used[old] -= 1
+        while i < len(values) and not consistent(var, values[i], assignment, csp):
+            i += 1
+        if i == len(values): # no value left, backtrack
+            if csp.stats is not None:
+                csp.stats.backtracks += 1
+            if budget is not None:
+                budget.improve(assignment, 0, csp.n - len(assignment)) # deepest node of the branch
+            depth -= 1
+            continue
+        assignment[var.key] = values[i] # add {var = value} to assignment
+        if used is not None:
+            used[values[i]] += 1
+        frame[2] = i + 1
+        states += 1
+        if is_complete(assignment, csp):
+            print(states)
+            states_list.append(states)
+            return assignment
+        if budget is not None and not budget.spend():
+            budget.improve(assignment, 0, csp.n - len(assignment)) # out of budget, keep the current branch
+            csp.undo(start) # so a later search on this csp starts from the same domains
+            return False
+        var = plain_select_unassigned_variable(assignment, csp)
+        values = plain_order_domain_values(var, assignment, csp)
+        if used is not None:
+            values = break_symmetry(values, used)
+        stack[depth] = [var, values, 0]
+        depth += 1
     return False
 
 # -------------------------------------------------------
@@ -117,13 +162,8 @@ def plain_recursive_backtracking(assignment, csp): # returns solution or failure
 
 def count_constraints(csp):
     count = {}
-    for n in range(csp.n):
-        count[str(n)] = 0
-    for constraint in csp.constraints:
-        u = constraint[0]
-        v = constraint [1]
-        count[u] += 1
-        count[v] += 1
+    for node in csp.variables:
+        count[node.key] = len(csp.get_neighbors(node))
     return count
 
 def improved_select_unassigned_variable(assignment, csp):
@@ -137,8 +177,8 @@ def improved_select_unassigned_variable(assignment, csp):
     
     min = unassigned[0]
     for var in unassigned[1:]: 
-        var_values = len(var.domain) # possible remaining values for var
-        min_values = len(min.domain) # possible remaining values for min
+        var_values = csp.size(var) # possible remaining values for var
+        min_values = csp.size(min) # possible remaining values for min
         if (var_values < min_values): # mvc heuristic
             min = var
         elif (var_values == min_values): # degree heuristic
@@ -146,6 +186,69 @@ def improved_select_unassigned_variable(assignment, csp):
                 min = var
     return min
 
+class VariableSelector:
+    # MRV / degree selection from a heap instead of rescanning every variable at each search node
+    # key (remaining values, -static degree, -unassigned neighbors, id), smallest first
+    # the heap holds, for every unassigned variable, an entry with a key <= its current key:
+    # keys that grew (domains restored, neighbors assigned) are fixed lazily when they reach the top,
+    # keys that shrank (domains pruned, neighbors unassigned) are pushed again by changed / unassigned
+    def __init__(self, csp, assignment):
+        self.csp = csp
+        self.assignment = assignment
+        self.degree = [len(csp.get_neighbors(node)) for node in csp.variables] # computed once
+        self.free = [] # dynamic degree, number of unassigned neighbors
+        for node in csp.variables:
+            self.free.append(sum(1 for neighbor in csp.get_neighbors(node) if neighbor.key not in assignment))
+        self.rebuild()
+
+    def rebuild(self): # drop the stale entries
+        self.heap = [self.key(node.id) for node in self.csp.variables if node.key not in self.assignment]
+        heapq.heapify(self.heap)
+
+    def key(self, id):
+        return (popcount(self.csp.domains[id]), -self.degree[id], -self.free[id], id)
+
+    def push(self, id):
+        heapq.heappush(self.heap, self.key(id))
+        if len(self.heap) > 4 * self.csp.n + 64:
+            self.rebuild()
+
+    def changed(self, nodes): # domains of nodes shrank
+        for node in nodes:
+            if node.key not in self.assignment:
+                self.push(node.id)
+
+    def assigned(self, keys): # keys were added to the assignment
+        adjacency = self.csp.adjacency
+        for key in keys:
+            for neighbor in adjacency[key]:
+                self.free[neighbor.id] -= 1
+
+    def unassigned(self, keys): # keys were removed from the assignment
+        adjacency = self.csp.adjacency
+        for key in keys:
+            for neighbor in adjacency[key]:
+                self.free[neighbor.id] += 1
+        for key in keys:
+            self.push(key)
+            for neighbor in adjacency[key]:
+                if neighbor.key not in self.assignment:
+                    self.push(neighbor.id)
+
+    def select(self):
+        heap = self.heap
+        while heap:
+            entry = heap[0]
+            id = entry[-1]
+            if id in self.assignment: # assigned since it was pushed
+                heapq.heappop(heap)
+                continue
+            key = self.key(id)
+            if key == entry:
+                return self.csp.variables[id]
+            heapq.heapreplace(heap, key) # stale, reinsert with the current key
+        return False
+
 def improved_order_domain_values(var, assignment, csp):
     # least constraining value, use LCV
     # the one that rules out the fewest values in the remaining variables
@@ -155,13 +258,15 @@ def improved_order_domain_values(var, assignment, csp):
 
     # assume the value for the variable and 
     # use the constraint graph to check how many values remain for the other variables
-    for value in var.domain:
-        counter = 0 # amount of choices
-        for neighbor in csp.get_neighbors(var): # neighbor (from constraint)
-            if (value in neighbor.domain):
-                counter += (len(neighbor.domain)-1)
-            else:
-                counter += len(neighbor.domain)
+    neighbors = csp.get_neighbors(var)
+    total = 0 # amount of choices for the neighbors before the assignment
+    for neighbor in neighbors:
+        total += csp.size(neighbor)
+    for value in csp.values(var):
+        counter = total # amount of choices
+        for neighbor in neighbors: # neighbor (from constraint)
+            if csp.has(neighbor, value): # value is ruled out for this neighbor
+                counter -= 1
         values_remain[value] = counter
 
     ordered_domains = sorted(values_remain, key=values_remain.get)
@@ -173,19 +278,24 @@ def forward_checking(csp, var, value, assignment):
     # when a variable is assigned a value
     # prune incompatible values from the domain of its neighbors
     # terminate when any variable has no legal values
-    unassigned = get_unassigned(csp, assignment)
+    reason = csp.explain(var) if csp.reasons is not None else 0
+    pruned = 0
     for xj in csp.get_neighbors(var): # for all xj exsits in neighbors (of xi)
-        if (xj in unassigned):
+        if (xj.key not in assignment):
             # pruning xj when xi = a
-            new_dom = copy(xj.domain)
-            if value in xj.domain:
-                new_dom.remove(value)
-                xj.domain = new_dom       
+            if csp.has(xj, value):
+                csp.prune(xj, value, reason)
+                pruned += 1
             # for all b exists in domain (of xj)
                 # xi = a AND xj = b is incompatible (according to constraint)
                     # xj.domain.remove(b) # then remove b from domain (xj)
-            if (not xj.domain): # xj has no legal values
+            if (not csp.domains[xj.id]): # xj has no legal values
+                csp.wipeout = xj
+                if csp.stats is not None:
+                    csp.stats.prunes += pruned
                 return False   
+    if csp.stats is not None:
+        csp.stats.prunes += pruned
     return csp
 
 def copy(arr): # makes a deep copy of the array
@@ -194,15 +304,18 @@ def copy(arr): # makes a deep copy of the array
         new.append(element)
     return new
 
-def remove_inconsistent_values(xi, xj):
+def remove_inconsistent_values(csp, xi, xj):
     # prune domain of xi based on xj
     removed = False
-    for x in xi.domain: # for each x in Domain[xi] do
-        # if no value y in Domain[xj] allows (x,y) to satisfy the constraint Xi <-> Xj
-        if len(xj.domain) == 1 and x in xj.domain:
-            # then delete x from Domain[xi]
-            xi.domain.remove(x)
-            removed = True
+    dj = csp.domains[xj.id]
+    # for each x in Domain[xi] do
+    # if no value y in Domain[xj] allows (x,y) to satisfy the constraint Xi <-> Xj,
+    # only possible when Domain[xj] is the single value x
+    if dj and not (dj & (dj - 1)) and (csp.domains[xi.id] & dj):
+        # then delete x from Domain[xi], because of whatever reduced xj to x
+        reason = csp.explain(xj) if csp.reasons is not None else 0
+        csp.prune(xi, dj.bit_length() - 1, reason)
+        removed = True
         # check = copy(xj.domain)
         # if x in check:
         #     check.remove(x)
@@ -221,11 +334,13 @@ def ac3(csp):
         queue.append(constraint) # x->y
         queue.append(constraint[::-1]) # y->x
 
+    revisions = 0
     while queue: # while queue is not empty
         arc = queue.pop(0) # (xi, xj) <- remove-first(queue)
+        revisions += 1
         xi = csp.get_node(arc[0])
         xj = csp.get_node(arc[1])
-        if remove_inconsistent_values(xi, xj): # remove-inconsistent-values(xi,xj) then
+        if remove_inconsistent_values(csp, xi, xj): # remove-inconsistent-values(xi,xj) then
             for xk in csp.get_neighbors(xi): # for each xk in neighbors[xi] do
                 queue.append((xk.key, xi.key))
     # if you remove anything from a variable, 
@@ -238,6 +353,8 @@ def ac3(csp):
         # if domain of xi was pruned
             # add all arcs xk -> xi to the queue
     
+    if csp.stats is not None:
+        csp.stats.revisions += revisions
     # returns ths csp, possible with reduced domains
     return csp
 
@@ -257,80 +374,462 @@ def ac3(csp):
     # • Arc consistency detects failure earlier than forward checking
     # • Can be run as a preprocessor or after each assignment
 
-def inference(csp, var, value, assignment):
+def mac3(csp, changed):
+    # maintaining arc consistency (MAC)
+    # AC3 started only from the arcs into the variables whose domains just changed,
+    # the rest of the csp is already arc consistent from the previous inference
+    queue = deque()
+    queued = set() # arcs currently in the queue, so an arc is never queued twice
+    for xj in changed:
+        for xi in csp.get_neighbors(xj):
+            arc = (xi.id, xj.id)
+            if arc not in queued:
+                queued.add(arc)
+                queue.append((xi, xj))
+
+    revisions = 0
+    while queue: # while queue is not empty
+        xi, xj = queue.popleft() # (xi, xj) <- remove-first(queue)
+        queued.discard((xi.id, xj.id))
+        revisions += 1
+        if remove_inconsistent_values(csp, xi, xj): # remove-inconsistent-values(xi,xj) then
+            if not csp.domains[xi.id]: # xi has no legal values, fail right away
+                csp.wipeout = xi
+                if csp.stats is not None:
+                    csp.stats.revisions += revisions
+                return False
+            for xk in csp.get_neighbors(xi): # for each xk in neighbors[xi] do
+                arc = (xk.id, xi.id)
+                if arc not in queued:
+                    queued.add(arc)
+                    queue.append((xk, xi))
+    if csp.stats is not None:
+        csp.stats.revisions += revisions
+    return csp
+
+class NogoodStore:
+    # bounded store of nogoods (partial colorings that cannot be extended to a solution),
+    # learned by backjumping; when full the least recently used nogood is evicted
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.nogoods = OrderedDict() # frozenset of (key, value) -> None, least recently used first
+        self.index = {} # (key, value) -> nogoods containing it
+
+    def add(self, pairs):
+        nogood = frozenset(pairs)
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.index.setdefault(pair, set()).add(nogood)
+        if len(self.nogoods) > self.capacity:
+            old, _ = self.nogoods.popitem(last=False)
+            for pair in old:
+                nogoods = self.index[pair]
+                nogoods.discard(old)
+                if not nogoods:
+                    del self.index[pair]
+
+    def find(self, key, value, assignment):
+        # a stored nogood that {key = value} would complete, or None
+        for nogood in self.index.get((key, value), ()):
+            for other, color in nogood:
+                if other != key and assignment.get(other) != color:
+                    break
+            else:
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
+
+class SearchOptions:
+    # options for the improved DFS-B
+    def __init__(self, propagation="mac", selection="heap", symmetry=False, backjump=False, nogoods=0):
+        # "mac": AC3 from the arcs of the changed variables only, stops at the first wipeout
+        # "ac3": AC3 over all arcs of the csp after every assignment
+        self.propagation = propagation
+        # "heap": VariableSelector, ties on MRV and degree broken by the number of unassigned neighbors
+        # "scan": improved_select_unassigned_variable over all unassigned variables
+        self.selection = selection
+        # True: only try the colors already in use and the lowest unused one (color symmetry breaking)
+        self.symmetry = symmetry
+        # True: conflict-directed backjumping, a dead end jumps back to the deepest assignment in its conflict set
+        self.backjump = backjump
+        # with backjump, the number of nogoods kept in a NogoodStore (0 keeps none)
+        self.nogoods = nogoods
+
+def inference(csp, var, value, assignment, checkpoint, options):
     # pruning domains (prune out values form the CSP) using forward checking and using AC3
     # forward checking
     f_check = forward_checking(csp,var,value, assignment)
     # constraint propagation
     # arc consistency
+    if options.propagation == "mac":
+        if not f_check:
+            return False
+        return mac3(csp, csp.changed_since(checkpoint))
     a_check = ac3(csp)
     # a_check = True
     return f_check and a_check
 
-def improved_backtracking_search(csp):
-    colors = []
-    for color in range(csp.k):
-        colors.append(color)
+def improved_backtracking_search(csp, options=None, budget=None):
+    # budget as in plain_backtracking_search
+    if options is None:
+        options = SearchOptions()
     global states
     states = 0
-    return improved_recursive_backtracking({}, csp, colors)
-
-def improved_recursive_backtracking(assignment, csp, colors):
+    result = improved_iterative_backtracking({}, csp, options, budget)
+    if csp.stats is not None:
+        csp.stats.nodes += states
+    return result
+
+def select_variable(selector, assignment, csp):
+    if selector:
+        return selector.select()
+    return improved_select_unassigned_variable(assignment, csp)
+
+def new_frame(var, assignment, csp, used, depth, options):
+    # [var, values, index of the next value, checkpoint of the current value, inferred keys, conflict set]
+    # the conflict set (backjumping) is a bitmask of the depths whose assignments removed values of var
+    values = improved_order_domain_values(var, assignment, csp)
+    conflict = 0
+    if options.backjump:
+        conflict = csp.explain(var) # values pruned before var was selected
+    if used is not None:
+        tried = break_symmetry(values, used)
+        if options.backjump and len(tried) < len(values):
+            conflict |= (1 << depth) - 1 # the skipped colors depend on every color used above
+        values = tried
+    return [var, values, 0, None, None, conflict]
+
+def undo_frame(frame, assignment, csp, selector, used):
+    # removes the current value of the frame's variable and its inferences
+    var, values, i, checkpoint, inferred, conflict = frame
+    for key in inferred + [var.key]:
+        old = assignment.pop(key)
+        if used is not None:
+            used[old] -= 1
+    csp.undo(checkpoint)
+    frame[3] = None
+    if selector:
+        selector.unassigned(inferred + [var.key])
+
+def conflicting_neighbor(var, value, assignment, csp):
+    # an assigned neighbor of var with the given value, or None
+    for neighbor in csp.get_neighbors(var):
+        if assignment.get(neighbor.key) == value:
+            return neighbor
+    return None
+
+def improved_iterative_backtracking(assignment, csp, options, budget=None):
+    # MRV / degree variable selection, least constraining values first, and inference
+    # (forward checking plus AC3 or MAC) after every assignment, with an explicit stack instead of recursion
+    # each frame is new_frame(...), the frame at depth d assigns the decision variable of depth d
+    # the inferred keys are removed on backtrack, so the assignment is never copied
+    # with options.backjump every removed value records the depths that caused it (csp.reasons),
+    # a variable left without values jumps back to the deepest depth in its conflict set
+    # instead of the previous one, optionally learning the conflict as a nogood
     global states
+    global states_list
     states += 1
-    if is_complete(assignment, csp): # if assignment is complete, return assignment (like goal test)
+    if is_complete(assignment, csp):
         print(states)
-        global states_list
         states_list.append(states)
         return assignment
-    var = improved_select_unassigned_variable(assignment, csp) # var <- select_unassigned_variable(variables[csp],assignment,csp)
-    for value in improved_order_domain_values(var, assignment, csp): # given the variable (var) that we have, explore all possible values that you can assign
-        if consistent(var, value, assignment, csp): # if value is consistent with assignment given constraints[csp] then
+    start = csp.checkpoint() # the domains the search was given, restored when the budget stops it
+    backjump = options.backjump
+    csp.reasons = {} if backjump else None
+    nogoods = NogoodStore(options.nogoods) if backjump and options.nogoods > 0 else None
+    stack = [None] * (csp.n + 1) # every frame assigns a variable, so depth <= n
+    selector = None
+    if options.selection == "heap":
+        selector = VariableSelector(csp, assignment)
+    used = color_usage(csp, assignment) if options.symmetry else None
+    var = select_variable(selector, assignment, csp)
+    stack[0] = new_frame(var, assignment, csp, used, 0, options)
+    depth = 1
+    while depth:
+        frame = stack[depth-1]
+        var, values, i, checkpoint, inferred, conflict = frame
+        if checkpoint is not None:
+            # the current value of var failed below, remove it and its inferences
+            undo_frame(frame, assignment, csp, selector, used)
+        descend = False
+        while i < len(values):
+            value = values[i]
+            i += 1
+            if not backjump:
+                if not consistent(var, value, assignment, csp):
+                    continue
+            else:
+                neighbor = conflicting_neighbor(var, value, assignment, csp)
+                if neighbor is not None:
+                    frame[5] |= csp.explain(neighbor)
+                    continue
+                if nogoods:
+                    nogood = nogoods.find(var.key, value, assignment)
+                    if nogood is not None:
+                        for key, color in nogood:
+                            if key != var.key:
+                                frame[5] |= csp.explain(csp.variables[key])
+                        continue
             assignment[var.key] = value # add {var = value} to assignment
-            var.domain = [value] # set domain
-
-            restore_assignment = {}
-            for a in assignment:
-                restore_assignment[a] = assignment[a]
-
-            inferences = inference(csp, var, value, assignment)
-            if inferences:
-                # add inferences to the assignment
-                for inference_var in csp.variables:
-                    if len(inference_var.domain) == 1:
-                        assignment[inference_var.key] = inference_var.domain[0]
-
-                states += 1
-                result = improved_recursive_backtracking(assignment, csp, colors)
-                if (result): # if result not equal failure then return result
-                    return result
-                
+            checkpoint = csp.checkpoint()
+            csp.reduce(var, value, 1 << (depth-1)) # set domain
+            if inference(csp, var, value, assignment, checkpoint, options):
+                # add inferences to the assignment, only domains changed since the checkpoint can be new singletons
+                inferred = []
+                changed = csp.changed_since(checkpoint)
+                for node in changed:
+                    mask = csp.domains[node.id]
+                    if mask and not (mask & (mask - 1)) and node.key not in assignment:
+                        assignment[node.key] = mask.bit_length() - 1
+                        inferred.append(node.key)
+                if selector:
+                    selector.assigned(inferred + [var.key])
+                    selector.changed(changed)
+                if used is not None:
+                    for key in inferred + [var.key]:
+                        used[assignment[key]] += 1
+                frame[2] = i
+                frame[3] = checkpoint
+                frame[4] = inferred
+                descend = True
+                break
             # assignment fails
-            # remove inferences from assignment (restore domains)
-            for c in csp.variables:
-                if (c.key in assignment) and (c.key not in restore_assignment):
-                    assignment.pop(c.key, None)
-            
-            for node in get_unassigned(csp, assignment):
-                node.domain = copy(colors)
-            
-            # remove {var = value} and inferences from assignment
-            assignment.pop(var.key, None) 
-            var.domain = copy(colors) # reset domain
+            if backjump:
+                frame[5] |= csp.explain(csp.wipeout)
+            assignment.pop(var.key, None)
+            csp.undo(checkpoint)
+        if not descend: # no value left, backtrack
+            if csp.stats is not None:
+                csp.stats.backtracks += 1
+            if budget is not None:
+                budget.improve(assignment, 0, csp.n - len(assignment)) # deepest node of the branch
+            if not backjump:
+                depth -= 1
+                continue
+            conflict = frame[5] & ~(1 << (depth-1))
+            if not conflict: # no assignment above is to blame, there is no solution
+                break
+            if nogoods:
+                levels = [level for level in range(depth-1) if (conflict >> level) & 1]
+                nogoods.add([(stack[level][0].key, assignment[stack[level][0].key]) for level in levels])
+            # jump back to the deepest culprit, the assignments in between are undone untried
+            target = conflict.bit_length() - 1
+            for level in range(depth-2, target, -1):
+                undo_frame(stack[level], assignment, csp, selector, used)
+            stack[target][5] |= conflict
+            depth = target + 1
+            continue
+        states += 2 # the assignment and the search node below it
+        if is_complete(assignment, csp):
+            print(states)
+            states_list.append(states)
+            return assignment
+        if budget is not None and not budget.spend(2):
+            budget.improve(assignment, 0, csp.n - len(assignment)) # out of budget, keep the current branch
+            csp.undo(start) # so a later search on this csp starts from the same domains
+            return False
+        var = select_variable(selector, assignment, csp)
+        stack[depth] = new_frame(var, assignment, csp, used, depth, options)
+        depth += 1
+    return False
+
+# -------------------------------------------------------
+### parallel improved DFS-B ###
+
+# embarrassingly parallel search: the top of the search tree is expanded breadth first
+# (MRV variable, LCV values, with inference) until there are enough open nodes, then each
+# open node is a subproblem, given as its decisions [(key, value), ...], searched by a pool worker
+# the first solution terminates the pool; there is no solution only when every subproblem fails
+
+def apply_decisions(csp, decisions, options):
+    # resets the domains and replays the decisions with inference,
+    # returns the assignment (decisions and inferred values) or False if they fail
+    csp.domains = [csp.full] * csp.n
+    csp.trail = []
+    csp.reasons = None # the decisions are fixed, backjumping never blames them
+    assignment = {}
+    for key, value in decisions:
+        var = csp.variables[key]
+        if key in assignment: # inferred by an earlier decision
+            if assignment[key] != value:
+                return False
+            continue
+        if not csp.has(var, value):
+            return False
+        assignment[key] = value
+        checkpoint = csp.checkpoint()
+        csp.reduce(var, value)
+        if not inference(csp, var, value, assignment, checkpoint, options):
+            return False
+        for node in csp.changed_since(checkpoint):
+            mask = csp.domains[node.id]
+            if mask and not (mask & (mask - 1)) and node.key not in assignment:
+                assignment[node.key] = mask.bit_length() - 1
+    return assignment
+
+def count_backtrack(csp): # a subproblem whose decisions fail counts as a dead end of the search
+    if csp.stats is not None:
+        csp.stats.backtracks += 1
+
+def split_search(csp, options, target, budget=None):
+    # expands open nodes breadth first until there are at least target of them
+    # returns (solution, []) if one is found while splitting, else (None, open nodes);
+    # (None, None) when the budget runs out first
+    global states
+    frontier = deque([[]])
+    while frontier and len(frontier) < target:
+        if budget is not None and not budget.spend():
+            return None, None
+        decisions = frontier.popleft()
+        states += 1
+        assignment = apply_decisions(csp, decisions, options)
+        if assignment is False:
+            count_backtrack(csp)
+            continue
+        if is_complete(assignment, csp):
+            return assignment, []
+        var = VariableSelector(csp, assignment).select()
+        values = improved_order_domain_values(var, assignment, csp)
+        if options.symmetry:
+            values = break_symmetry(values, color_usage(csp, assignment))
+        children = len(frontier)
+        for value in values:
+            if consistent(var, value, assignment, csp):
+                frontier.append(decisions + [(var.key, value)])
+        if len(frontier) == children: # no value left
+            count_backtrack(csp)
+    return None, list(frontier)
+
+def subtree_worker(csp, options, tasks, next_task, results, seconds=None, nodes=None):
+    # searches the next unclaimed subproblem (next_task is a shared counter) until one has a
+    # solution, none is left or its budget (seconds, nodes) runs out, then puts
+    # (solution or False, stats, budget) on results; stats are this worker's counters, nodes included
+    # (the search's progress output is discarded, the parent prints the total)
+    global states
+    stats = Stats()
+    csp.stats = stats
+    budget = Budget(seconds, nodes)
+    try:
+        while True:
+            with next_task.get_lock():
+                i = next_task.value
+                next_task.value += 1
+            if i >= len(tasks):
+                break
+            states = 0
+            assignment = apply_decisions(csp, tasks[i], options)
+            if assignment is False:
+                count_backtrack(csp)
+            else:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    assignment = improved_iterative_backtracking(assignment, csp, options, budget)
+            stats.nodes += states
+            if assignment:
+                results.put((assignment, stats, budget))
+                return
+            if budget.exhausted:
+                break
+        results.put((False, stats, budget))
+    except Exception as error: # reported, so the parent does not wait forever
+        results.put((error, stats, budget))
+
+def parallel_backtracking_search(csp, options=None, processes=None, subproblems=30, budget=None):
+    # improved DFS-B on processes workers (all cores by default), with about
+    # subproblems open nodes per worker so the load stays balanced
+    # the workers are processes like in portfolio.py, stopped as soon as one finds a solution
+    # budget as in plain_backtracking_search: the parent checks the time while it waits for the
+    # workers, and each worker gets the time left and an equal share of the nodes left
+    global states
+    if options is None:
+        options = SearchOptions()
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes <= 1:
+        return improved_backtracking_search(csp, options, budget)
+    if budget is None:
+        budget = Budget()
+    states = 0
+    solution, tasks = split_search(csp, options, subproblems * processes, budget)
+    csp.domains = [csp.full] * csp.n # the split leaves the domains of its last node
+    csp.trail = []
+    if csp.stats is not None:
+        csp.stats.nodes += states
+    if solution:
+        print(states)
+        states_list.append(states)
+        return solution
+    if tasks is None: # out of budget while splitting
+        return False
+    total = states
+    assignment = False
+    exhausted = None
+    context = pool_context()
+    results = context.Queue()
+    next_task = context.Value('q', 0)
+    count = min(processes, len(tasks))
+    seconds = None
+    if budget.seconds is not None:
+        seconds = max(0.0, budget.seconds - budget.elapsed())
+    nodes = None
+    if budget.nodes is not None:
+        nodes = max(1, (budget.nodes - budget.count) // max(count, 1))
+    workers = []
+    for i in range(count):
+        workers.append(context.Process(target=subtree_worker, args=(csp, options, tasks, next_task, results, seconds, nodes)))
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    try:
+        pending = count # one result per worker, unless a solution comes first
+        while pending:
+            # wake up at least every interval for the progress callback, and at the time limit
+            # once the time is up the workers, which stop at the same limit, get one more interval to report
+            timeout = budget.interval
+            if budget.seconds is not None and not budget.exhausted:
+                timeout = max(0, min(timeout, budget.seconds - budget.elapsed()))
+            try:
+                assignment, stats, worker_budget = results.get(timeout=timeout)
+            except queue.Empty:
+                if budget.exhausted:
+                    break
+                budget.tick()
+                continue
+            pending -= 1
+            total += stats.nodes
+            budget.count += stats.nodes
+            if csp.stats is not None:
+                csp.stats.add(stats)
+            if isinstance(assignment, Exception):
+                raise assignment
+            if worker_budget.best is not None:
+                budget.improve(worker_budget.best, worker_budget.best_conflicts, worker_budget.best_unassigned)
+            if assignment:
+                break
+            if worker_budget.exhausted:
+                exhausted = worker_budget.exhausted
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+    states = total
+    if assignment:
+        print(states)
+        states_list.append(states)
+        return assignment
+    if exhausted and not budget.exhausted: # a worker ran out, its subtrees were not all searched
+        budget.exhausted = exhausted
     return False
 
 # -------------------------------------------------------
 
 # writes the solution assignment to the output file
-def write_output(assignment, file):
-    f = open(file, "w")
-    for i in sorted(assignment): 
-        color = str(assignment[i])
-        f.write(color)
-        if not i == sorted(assignment)[-1]:
-            f.write("\n")
-    f.close()
-    return True
+def write_output(assignment, file): # "No answer" when there is no solution
+    return write_solution(assignment, file)
 
 ### Main class ###
 
@@ -338,26 +837,57 @@ if __name__ == '__main__':
     # dfsb.py - This should run in two modes. a) Plain DFS-B and 
     # b)DFS-B with variable, value ordering + AC3 for constraint propagation.
     # A sample execution of dfsb.py should be as below:
-        # python dfsb.py <INPUT FILE> <OUTPUT FILE> <MODE FLAG>.
-    # <MODE FLAG> can be either 0 (plain DFS-B) or 1 (improved DFS-B).
+        # python dfsb.py <INPUT FILE> <OUTPUT FILE> <MODE FLAG> [--symmetry] [--backjump] [--nogoods=N] [--processes=N].
+    # <MODE FLAG> can be either 0 (plain DFS-B), 1 (improved DFS-B) or 2 (improved DFS-B on all cores).
+    # --symmetry only tries the colors in use and the lowest unused color.
+    # --backjump (improved DFS-B) uses conflict-directed backjumping,
+    # --nogoods=N also keeps up to N learned nogoods (implies --backjump).
+    # --profile prints the solve statistics as JSON, --cprofile[=FILE] runs the search under cProfile.
+    # --processes=N (mode 2) uses N worker processes instead of one per core.
     
     # (sys.argv[0]) # dfsb.py
     input = (sys.argv[1]) # INPUT FILE PATH
     output = (sys.argv[2]) # OUTPUT FILE PATH
     mode = (sys.argv[3]) # MODE FLAG
+    flags = sys.argv[4:]
+    nogoods = 0
+    processes = None
+    for flag in flags:
+        if flag.startswith("--nogoods="):
+            nogoods = int(flag.split("=", 1)[1])
+        elif flag.startswith("--processes="):
+            processes = int(flag.split("=", 1)[1])
+
+    options = SearchOptions(symmetry="--symmetry" in flags, backjump="--backjump" in flags or nogoods > 0, nogoods=nogoods)
+    profile, cprofile, cprofile_file = profile_flags(flags)
     
     start = datetime.datetime.now()
 
-    csp = input_to_csp(input)
+    stats = Stats()
+    with stats.phase("parse"):
+        csp = input_to_csp(input)
+    if profile:
+        csp.stats = stats
     assignment = []
     
+    search = None
     if (mode == '0'): # plain DFS-B
-        assignment = plain_backtracking_search(csp)
+        search = plain_backtracking_search
     elif (mode == '1'): # improved DFS-B
-        assignment = improved_backtracking_search(csp)
+        search = improved_backtracking_search
+    elif (mode == '2'): # parallel improved DFS-B
+        search = lambda csp, options: parallel_backtracking_search(csp, options, processes)
+    with stats.phase("search"):
+        if search and cprofile:
+            assignment = run_profiled(search, (csp, options), cprofile_file)
+        elif search:
+            assignment = search(csp, options)
     
     # write to output file
-    write_output(assignment, output)
+    with stats.phase("write"):
+        write_output(assignment, output)
+    if profile:
+        print(stats.to_json())
 
     end = datetime.datetime.now()
     time_elapsed = (end - start)
@@ -365,46 +895,3 @@ if __name__ == '__main__':
     # print("constraints", csp.constraints)
     # print("result", assignment)
     print("time elapsed", time_elapsed)
-    
-    # print(plain_backtracking_search(input_to_csp(input)))
-    # print("---")
-    # print(improved_backtracking_search(input_to_csp(input)))
-
-    # print(improved_backtracking_search(input_to_csp("backtrack_easy")))
-    # print("---")
-    # print(improved_backtracking_search(input_to_csp("backtrack_hard")))
-    
-    '''
-    times = []
-
-    for i in range(20):
-        print("test", i)
-        # state = CSPGenerator(20, 100, 4, "parameter_set") # N M K
-        # state = CSPGenerator(50, 625, 4, "parameter_set") # N M K
-        state = CSPGenerator(100, 2500, 4, "parameter_set") # N M K
-        # state = CSPGenerator(200, 10000, 4, "parameter_set") # N M K
-        # state = CSPGenerator(400, 40000, 4, "parameter_set") # N M K
-        start = datetime.datetime.now()
-        csp = input_to_csp("parameter_set")
-        assignment = []
-        # assignment = plain_backtracking_search(csp)
-        assignment = improved_backtracking_search(csp)
-        write_output(assignment, "output")
-        end = datetime.datetime.now()
-        time_elapsed = (end - start) * 1000.0 # milliseconds
-        print(time_elapsed)
-        times.append(time_elapsed.total_seconds())
-        print("---")
-    print(states_list)
-    x = states_list
-    mean = sum(x) / len(x)
-    print("mean states", mean)
-    sd = math.sqrt(sum([(val - mean)**2 for val in x])/(len(x) - 1))
-    print("sd states", sd)
-    # print("times", times)
-    x = times
-    mean = sum(x) / len(x)
-    print("mean times", mean)
-    sd = math.sqrt(sum([(val - mean)**2 for val in x])/(len(x) - 1))
-    print("sd times", sd)
-    '''
\ No newline at end of file
@@ -0,0 +1,211 @@
+import sys
+import time
+import random
+import datetime
+import solver
+from loader import input_to_csp, write_solution
+from minconflicts import ConflictTable, MinConflictsOptions, choose_value
+
+# -------------------------------------------------------
+# incremental re-solving: a solved csp stays in memory while constraints are added and removed
+# a few at a time; the coloring is repaired by min-conflicts seeded with the previous colors,
+# which only moves conflicted variables and so stays in the neighborhoods of the changed
+# constraints; a full solve is run only when the repair fails within its step budget
+#
+#   import incremental
+#   inc = incremental.IncrementalSolver(csp)
+#   inc.add(3, 7)
+#   inc.remove(0, 1)
+#   inc.resolve() -> {variable: new color} for the recolored variables, or False (no solution)
+#
+# python incremental.py <INPUT FILE> <OUTPUT FILE> <CHANGES FILE>
+# one change per line in the changes file: "+ u v" adds a constraint, "- u v" removes one,
+# "solve" re-solves after the changes so far (done again at the end)
+# -------------------------------------------------------
+
+# tabu search with random-walk noise, continuing from the previous coloring
+REPAIR_OPTIONS = MinConflictsOptions(tabu_tenure=10, walk_probability=0.02, restart=False)
+
+class IncrementalSolver:
+    def __init__(self, csp, assignment=None, engine="improved", seconds=None, repair_steps=1000, options=None):
+        # assignment: a solution of csp to start from, csp is solved with engine when there is none
+        self.csp = csp
+        self.engine = engine # engine of the full solves, see anytime.ENGINES
+        self.seconds = seconds # wall-clock budget of a full solve, None for no limit
+        self.repair_steps = repair_steps # repair steps allowed per changed constraint
+        self.options = options if options is not None else REPAIR_OPTIONS
+        self.table = None # ConflictTable of the current coloring, None when there is none
+        self.status = None # "solved", "unsatisfiable" or "budget"
+        self.changes = 0 # constraints added or removed since the last resolve
+        self.relaxed = False # a constraint was removed since the last resolve
+        self.repairs = 0 # resolves done by a local repair
+        self.full_solves = 0 # resolves (and the first solve) done from scratch
+        self.steps = 0 # min-conflicts steps of the last repair
+        self.method = None # how the last resolve was done: "unchanged", "repair" or "full solve"
+        if csp.positions is None:
+            csp.index_constraints() # O(M) here, so that removals are O(degree)
+        if assignment:
+            self.table = ConflictTable(csp, assignment)
+            self.status = "solved"
+        else:
+            self.full_solve(None)
+
+    def add(self, u, v):
+        self.csp.add_constraint(u, v)
+        if self.table is not None:
+            self.table.add_constraint(u, v)
+        self.changes += 1
+
+    def remove(self, u, v):
+        self.csp.remove_constraint(u, v)
+        if self.table is not None:
+            self.table.remove_constraint(u, v)
+        self.changes += 1
+        self.relaxed = True
+
+    def update(self, added=(), removed=()): # applies (u, v) changes, then resolves
+        for u, v in removed:
+            self.remove(u, v)
+        for u, v in added:
+            self.add(u, v)
+        return self.resolve()
+
+    def resolve(self):
+        # returns the variables whose color changed, {variable: color}, or False when there is no solution
+        changes = self.changes
+        self.changes = 0
+        relaxed = self.relaxed
+        self.relaxed = False
+        if self.table is None:
+            if self.status == "unsatisfiable" and not relaxed:
+                self.method = "unchanged"
+                return False # adding constraints cannot make it satisfiable
+            return self.full_solve(None)
+        if not self.table.conflicted:
+            self.method = "unchanged"
+            return {} # removed constraints, or added ones the coloring already satisfies
+        before = self.repair(self.repair_steps * max(1, changes))
+        colors = self.table.colors
+        if not self.table.conflicted:
+            self.repairs += 1
+            self.method = "repair"
+            return {var: colors[var] for var in before if colors[var] != before[var]}
+        previous = list(colors)
+        for var in before:
+            previous[var] = before[var]
+        return self.full_solve(previous)
+
+    def repair(self, max_steps):
+        # min-conflicts from the current colors, only conflicted variables are moved
+        # returns {variable: color before the repair} for every variable it moved
+        table = self.table
+        options = self.options
+        k = self.csp.k
+        tabu = {} # var * k + color -> last step at which var may not take color
+        before = {}
+        steps = 0
+        flips = 0
+        for i in range(max_steps):
+            if not table.conflicted:
+                break
+            steps += 1
+            var = random.choice(table.conflicted)
+            value = choose_value(table, var, i, tabu, options)
+            old = table.colors[var]
+            if value != old:
+                flips += 1
+                if var not in before:
+                    before[var] = old
+                if options.tabu_tenure:
+                    tabu[var * k + old] = i + options.tabu_tenure
+                table.assign(var, value)
+        table.best_total = table.total
+        table.since_best = []
+        self.steps = steps
+        if self.csp.stats is not None:
+            self.csp.stats.nodes += steps
+            self.csp.stats.flips += flips
+        return before
+
+    def full_solve(self, previous):
+        # solves from scratch; previous is the coloring before the changes (None if there was none)
+        csp = self.csp
+        csp.domains = [csp.full] * csp.n # searches leave the domains of their last state
+        csp.trail = []
+        self.full_solves += 1
+        self.method = "full solve"
+        result = solver.solve_csp(csp, self.engine, self.seconds)
+        self.status = result.status
+        if not result.assignment:
+            self.table = None
+            return False
+        self.table = ConflictTable(csp, result.assignment)
+        colors = self.table.colors
+        if previous is None:
+            return {var: colors[var] for var in range(csp.n)}
+        return {var: colors[var] for var in range(csp.n) if colors[var] != previous[var]}
+
+    def color(self, var): # current color of var, None when there is no solution
+        if self.table is None:
+            return None
+        return self.table.colors[var]
+
+    def assignment(self): # the current solution as a dict variable -> color, or False, O(N)
+        if self.table is None:
+            return False
+        return dict(enumerate(self.table.colors))
+
+def read_changes(file):
+    # yields ("+", u, v), ("-", u, v) and ("solve", None, None)
+    with open(file, "r") as f:
+        for number, line in enumerate(f, 1):
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens == ["solve"]:
+                yield "solve", None, None
+            elif len(tokens) == 3 and tokens[0] in ("+", "-"):
+                yield tokens[0], int(tokens[1]), int(tokens[2])
+            else:
+                raise ValueError("{}, line {}: expected + u v, - u v or solve".format(file, number))
+
+def print_resolve(inc, changes, changed, seconds):
+    if changed is False:
+        print("{} changes: no solution, {} ({:.6f}s)".format(changes, inc.method, seconds))
+    else:
+        print("{} changes: {} recolored, {} ({:.6f}s)".format(changes, len(changed), inc.method, seconds))
+
+### Main class ###
+
+if __name__ == '__main__':
+    input = (sys.argv[1]) # INPUT FILE PATH
+    output = (sys.argv[2]) # OUTPUT FILE PATH
+    changes_file = (sys.argv[3]) # CHANGES FILE PATH
+
+    start = datetime.datetime.now()
+
+    csp = input_to_csp(input)
+    inc = IncrementalSolver(csp)
+    print("first solve:", inc.status, "time elapsed", datetime.datetime.now() - start)
+    changes = 0
+    for kind, u, v in read_changes(changes_file):
+        if kind == "+":
+            inc.add(u, v)
+            changes += 1
+        elif kind == "-":
+            inc.remove(u, v)
+            changes += 1
+        else:
+            begin = time.perf_counter()
+            changed = inc.resolve()
+            print_resolve(inc, changes, changed, time.perf_counter() - begin)
+            changes = 0
+    begin = time.perf_counter()
+    changed = inc.resolve()
+    print_resolve(inc, changes, changed, time.perf_counter() - begin)
+
+    write_solution(inc.assignment(), output)
+
+    end = datetime.datetime.now()
+    time_elapsed = (end - start)
+    print("time elapsed", time_elapsed)
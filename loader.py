@@ -0,0 +1,209 @@
+import os
+import sys
+import mmap
+import struct
+from array import array
+from CSP import CSP
+
+# shared input parser for dfsb.py and minconflicts.py
+
+# input file format
+# N variables, numbered 0 to N-1
+# M constraints connecting them
+# K possible colors for each of variables
+# then on each following line, give constraints one by one, U and V
+
+CHUNK = 1 << 20 # bytes parsed at a time
+
+def read_numbers(f):
+    # every integer of a binary file object, into one int array; the file is split a chunk at a time,
+    # carrying a token cut by the chunk end over to the next one, so the peak memory is the array
+    # plus one chunk and its tokens (never a bytes object per number of the whole file)
+    numbers = array('i')
+    rest = b''
+    while True:
+        block = f.read(CHUNK)
+        if not block:
+            break
+        block = rest + block
+        tokens = block.split()
+        rest = b''
+        if tokens and not block[-1:].isspace():
+            rest = tokens.pop()
+        numbers.extend(map(int, tokens))
+    if rest:
+        numbers.append(int(rest))
+    return numbers
+
+def read_instance(file):
+    # parses the constraints straight into a flat integer array u0 v0 u1 v1 ...
+    # (no tuple or string per constraint), returns n, m, k, edges
+    with open(file, 'rb') as f:
+        edges = read_numbers(f)
+    if len(edges) < 3:
+        raise ValueError("{}: missing 'N M K' header".format(file))
+    n = edges[0]
+    m = edges[1]
+    k = edges[2]
+    del edges[:3] # in place, no second copy of the array
+    check_instance(file, n, m, k, edges)
+    return n, m, k, edges
+
+def check_instance(file, n, m, k, edges):
+    # the constraints must match the declared header
+    if n < 0 or m < 0 or k < 1:
+        raise ValueError("{}: invalid header {} {} {}".format(file, n, m, k))
+    if len(edges) % 2 != 0:
+        raise ValueError("{}: last constraint has only one variable".format(file))
+    if len(edges) // 2 != m:
+        raise ValueError("{}: header declares {} constraints, found {}".format(file, m, len(edges) // 2))
+    if edges and (min(edges) < 0 or max(edges) >= n):
+        raise ValueError("{}: constraint variable outside 0 to {}".format(file, n - 1))
+
+# -------------------------------------------------------
+### binary instance format ###
+
+# compiled form of an instance file, so repeated runs skip the text parsing
+# all sections are native byte order and 8-byte aligned, so they can be memory mapped
+#   header   magic b'CSPB', version (uint32), n, m, k (int64)
+#   edges    2m int32, the constraints u0 v0 u1 v1 ... in input order
+#   offsets  n+1 int64, CSR row starts into targets
+#   targets  2m int32, neighbors of each variable (one entry per constraint, in input order)
+# (a self-loop u u appears once in edges and once in the neighbors of u,
+# the targets section is padded to 2m entries)
+
+MAGIC = b'CSPB'
+VERSION = 1
+HEADER = struct.Struct('=4sIqqq')
+
+def binary_path(file): # sidecar path of the compiled instance
+    return file + '.bin'
+
+def build_csr(n, edges):
+    # counting sort of the constraint endpoints, stable so each row keeps input order
+    offsets = array('q', [0]) * (n + 1)
+    for i in range(0, len(edges), 2):
+        u = edges[i]
+        v = edges[i+1]
+        offsets[u+1] += 1
+        if u != v:
+            offsets[v+1] += 1
+    for u in range(n):
+        offsets[u+1] += offsets[u]
+    targets = array('i', [0]) * len(edges)
+    fill = array('q', offsets[:n])
+    for i in range(0, len(edges), 2):
+        u = edges[i]
+        v = edges[i+1]
+        targets[fill[u]] = v
+        fill[u] += 1
+        if u != v:
+            targets[fill[v]] = u
+            fill[v] += 1
+    return offsets, targets
+
+def write_binary(file, n, m, k, edges):
+    offsets, targets = build_csr(n, edges)
+    with open(file, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n, m, k))
+        edges.tofile(f)
+        offsets.tofile(f)
+        targets.tofile(f)
+
+def read_binary(file):
+    # memory maps the compiled instance, the arrays are views into the file (no parsing or copying)
+    # returns n, m, k, edges, (offsets, targets)
+    with open(file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError("{}: not a compiled instance".format(file))
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, n, m, k = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{}: not a compiled instance (or wrong version / byte order)".format(file))
+    if size != HEADER.size + 16 * m + 8 * (n + 1):
+        raise ValueError("{}: truncated compiled instance".format(file))
+    view = memoryview(data)
+    start = HEADER.size
+    edges = view[start:start + 8 * m].cast('i')
+    start += 8 * m
+    offsets = view[start:start + 8 * (n + 1)].cast('q')
+    start += 8 * (n + 1)
+    targets = view[start:start + 8 * m].cast('i')
+    return n, m, k, edges, (offsets, targets)
+
+def compile_instance(file, output=None): # text instance -> binary sidecar
+    if output is None:
+        output = binary_path(file)
+    n, m, k, edges = read_instance(file)
+    write_binary(output, n, m, k, edges)
+    return output
+
+def has_sidecar(file):
+    # there is a compiled sidecar newer than the text file, or a sidecar without a text file
+    # (CSPGenerator.py can write the binary form only)
+    sidecar = binary_path(file)
+    if not os.path.exists(sidecar):
+        return False
+    return not os.path.exists(file) or os.path.getmtime(sidecar) >= os.path.getmtime(file)
+
+def is_binary(file): # file is itself a compiled instance (starts with the magic)
+    with open(file, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def binary_source(file): # path of the compiled instance to read for file, None for the text parser
+    if has_sidecar(file):
+        return binary_path(file)
+    if is_binary(file):
+        return file
+    return None
+
+def input_to_csp(file):
+    # file may be a text instance, a compiled one, or a text path whose compiled
+    # sidecar is newer (or the only one there)
+    binary = binary_source(file)
+    if binary is not None:
+        n, m, k, edges, csr = read_binary(binary)
+        return CSP(n, m, k, edges, csr)
+    n, m, k, edges = read_instance(file)
+    return CSP(n, m, k, edges)
+
+def read_edges(file): # n, m, k, edges without building the csp (compiled form when there is one)
+    binary = binary_source(file)
+    if binary is not None:
+        n, m, k, edges, csr = read_binary(binary)
+        return n, m, k, edges
+    return read_instance(file)
+
+# -------------------------------------------------------
+### solution files ###
+
+# one color per line, variable 0 first, no newline after the last color;
+# "No answer" when there is no solution
+
+def write_solution(assignment, file):
+    # the colors are joined and written in one buffered pass, in numeric variable order
+    with open(file, 'w') as f:
+        if not assignment:
+            f.write("No answer")
+            return False
+        try:
+            colors = [assignment[v] for v in range(len(assignment))]
+        except KeyError: # not numbered 0 to len-1
+            colors = [assignment[v] for v in sorted(assignment, key=int)]
+        f.write("\n".join(map(str, colors)))
+    return True
+
+def read_solution(file): # array of colors in variable order, or None for "No answer"
+    with open(file, 'rb') as f:
+        tokens = f.read().split()
+    if tokens == [b'No', b'answer']:
+        return None
+    return array('i', map(int, tokens))
+
+if __name__ == '__main__':
+    # python loader.py <INPUT FILE> [<BINARY FILE>]
+    # compiles the text instance, by default to the <INPUT FILE>.bin sidecar
+    input = sys.argv[1] # INPUT FILE PATH
+    output = sys.argv[2] if len(sys.argv) > 2 else None # BINARY FILE PATH
+    print(compile_instance(input, output))
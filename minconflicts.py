@@ -1,9 +1,13 @@
+import os
 import sys
+import queue
 import random
-from CSP import CSP
+import itertools
+import multiprocessing
+from loader import input_to_csp, write_solution
+from budget import Budget
+from stats import Stats, profile_flags, run_profiled
 import datetime
-from CSPGenerator import CSPGenerator
-import math
 
 # -------------------------------------------------------
 # Sources used:
@@ -27,32 +31,11 @@ def get_unassigned(csp, assignment):
                 unassigned.append(var)
         return unassigned
 
-# input file format
-# N variables, numbered 0 to N-1
-# M constraints connecting them
-# K possible colors for each of variables
-# then on each following line, give constraints one by one, U and V
-def input_to_csp(file):
-    f = open(file)
-    line = f.readline().strip('\n')
-    first = line.split()
-    n = first[0]
-    m = first[1]
-    k = first[2]
-    constraints = []
-    for line in f:
-        line = line.strip('\n')
-        c = line.split()
-        constraints.append((c[0], c[1]))
-    csp = CSP(n, m, k, constraints)
-    return csp
-
 # check if assignment is a valid
 def check_assignment(assignment, csp): # adjacent nodes cannot have the same color
-    for constraint in csp.constraints:
-        u = constraint[0]
-        v = constraint[1]
-        if (assignment[u] == assignment[v]):
+    edges = csp.edges
+    for i in range(0, len(edges), 2):
+        if (assignment[edges[i]] == assignment[edges[i+1]]):
             return False
     return True
 
@@ -76,58 +59,183 @@ def random_state(csp):
         assignment[node.key] = random.choice(csp.domain)
     return assignment
 
-# return conflicted variables
-def conflicted_variables(assignment, csp): # adjacent nodes cannot have the same color
-    conflicted = []
-    for constraint in csp.constraints:
-        u = constraint[0]
-        v = constraint[1]
-        if (assignment[u] == assignment[v]):
-            if (u not in conflicted):
-                conflicted.append(u)
-            if (v not in conflicted):
-                conflicted.append(v)
-    return conflicted
-
-# returns ordered array of values and # of conflicts for each value
-def conflicts(var, assignment, csp): # counts the number of conflicts for each value if assigned to the variable
-    ordered_conflicts = []
-    values_remain = {} # key = color, value = total number of conflicts
-
-    for value in var.domain:
-        counter = 0 # amount of conflicts
-        for constraint in csp.constraints:
-            u = constraint[0]
-            v = constraint[1]
-            if (u == var.key):
-                if (value == assignment[v]):
-                    counter += 1
-            elif (v == var.key):
-                if (assignment[u] == value):
-                    counter += 1
-            else:
-                if (assignment[u] == assignment[v]):
-                    counter += 1
-        values_remain[value] = counter
-    
-    ordered_conflicts = sorted(values_remain, key=values_remain.get)
-    return ordered_conflicts
+# conflict counts kept up to date as the state changes
+# counts[id][color] = number of neighbors of variable id currently assigned color
+# conflicted holds the ids whose own color is used by a neighbor, position indexes into it
+# total is the sum of the conflicts of every variable, best_total the lowest total seen so far
+# and since_best the (id, previous color) changes made after it, so the best state can be restored
+# reassigning a variable touches only its row of neighbors, O(degree)
+class ConflictTable:
+    def __init__(self, csp, assignment):
+        self.csp = csp
+        self.colors = [assignment[node.key] for node in csp.variables]
+        self.counts = [[0] * csp.k for _ in range(csp.n)]
+        for node in csp.variables:
+            row = self.counts[node.id]
+            for neighbor in csp.get_neighbors(node):
+                row[self.colors[neighbor.id]] += 1
+        self.conflicted = []
+        self.position = {}
+        self.total = 0
+        for node in csp.variables:
+            self.update(node.id)
+            self.total += self.conflicts(node.id)
+        self.best_total = self.total
+        self.since_best = []
+
+    def update(self, id): # add or remove id from the conflicted set
+        is_conflicted = self.counts[id][self.colors[id]] > 0
+        if is_conflicted and id not in self.position:
+            self.position[id] = len(self.conflicted)
+            self.conflicted.append(id)
+        elif not is_conflicted and id in self.position:
+            # swap with the last element so removal is O(1)
+            index = self.position.pop(id)
+            last = self.conflicted.pop()
+            if last != id:
+                self.conflicted[index] = last
+                self.position[last] = index
+
+    def conflicts(self, id): # number of conflicts of id with its current color
+        return self.counts[id][self.colors[id]]
+
+    def min_conflict_value(self, id): # the value that minimizes conflicts, lowest color on ties
+        row = self.counts[id]
+        return row.index(min(row))
+
+    def recolor(self, id, value):
+        old = self.colors[id]
+        if old == value:
+            return
+        self.colors[id] = value
+        colors = self.colors
+        for neighbor in self.csp.adjacency[id]:
+            j = neighbor.id
+            row = self.counts[j]
+            row[old] -= 1
+            row[value] += 1
+            if j != id: # a conflict on a constraint counts for both variables
+                if colors[j] == old:
+                    self.total -= 2
+                elif colors[j] == value:
+                    self.total += 2
+            self.update(j)
+        self.update(id)
+
+    def assign(self, id, value):
+        old = self.colors[id]
+        if old == value:
+            return
+        self.since_best.append((id, old))
+        self.recolor(id, value)
+        if self.total < self.best_total:
+            self.best_total = self.total
+            self.since_best = []
+
+    def restore_best(self): # go back to the best state, undoing the changes made after it
+        while self.since_best:
+            id, old = self.since_best.pop()
+            self.recolor(id, old)
+
+    # keep the counts in step with a constraint added to or removed from the csp
+    # (after csp.add_constraint / csp.remove_constraint), O(1)
+    def add_constraint(self, u, v):
+        self.count_constraint(u, v, 1)
 
-def min_conflicts(csp, max_steps, current_state):
+    def remove_constraint(self, u, v):
+        self.count_constraint(u, v, -1)
+
+    def count_constraint(self, u, v, sign):
+        colors = self.colors
+        self.counts[u][colors[v]] += sign
+        if u != v:
+            self.counts[v][colors[u]] += sign
+            if colors[u] == colors[v]:
+                self.total += 2 * sign
+        else:
+            self.total += sign
+        self.update(u)
+        self.update(v)
+        # the best state so far is the current one for the changed problem
+        self.best_total = self.total
+        self.since_best = []
+
+    def state(self, assignment): # write the current colors into the assignment
+        for node in self.csp.variables:
+            assignment[node.key] = self.colors[node.id]
+        return assignment
+
+class MinConflictsOptions:
+    # options for min-conflicts, the defaults are the plain algorithm
+    def __init__(self, max_steps=1000, tabu_tenure=0, walk_probability=0.0, restart=True):
+        self.max_steps = max_steps # steps per trial
+        # a variable may not go back to a color it left for tabu_tenure steps,
+        # unless the move reaches a state better than the best one seen (aspiration)
+        self.tabu_tenure = tabu_tenure
+        # probability that a step moves the chosen variable to a random other color (random walk)
+        self.walk_probability = walk_probability
+        # True: every trial starts from a new random state
+        # False: every trial continues from the best state of the previous one
+        self.restart = restart
+
+# preset used by mode 3 of minconflicts.py
+TABU_OPTIONS = MinConflictsOptions(tabu_tenure=10, walk_probability=0.02, restart=False)
+
+def choose_value(table, var, step, tabu, options):
+    k = table.csp.k
+    old = table.colors[var]
+    if options.walk_probability and k > 1 and random.random() < options.walk_probability:
+        value = random.randrange(k - 1) # random walk, any color but the current one
+        if value >= old:
+            value += 1
+        return value
+    if not options.tabu_tenure:
+        return table.min_conflict_value(var)
+    row = table.counts[var]
+    best = old
+    for value in range(k):
+        if value != old and tabu.get(var * k + value, -1) >= step:
+            # aspiration: a tabu value is allowed if it gives a better state than the best so far
+            if table.total + 2 * (row[value] - row[old]) >= table.best_total:
+                continue
+        if row[value] < row[best] or (row[value] == row[best] and value < best):
+            best = value
+    return best
+
+def min_conflicts(csp, max_steps, current_state, options=None, table=None, budget=None):
+    # table, when given, continues from its current colors instead of current_state
+    # budget (budget.Budget), when given, ends the trial early once it runs out
+    if options is None:
+        options = MinConflictsOptions()
+    if table is None:
+        table = ConflictTable(csp, current_state)
+    tabu = {} # var * k + color -> last step at which var may not take color
+    global steps
+    first = steps
+    flips = 0
+    result = False
     for i in range(max_steps): # for i ← 1 to max_steps do
-        global steps
         steps += 1
-        if is_complete(current_state, csp): # if current_state is a solution of csp then
+        if not table.conflicted: # if current_state is a solution of csp then
             print(steps)
-            return current_state # return current_state
-        conflicted = conflicted_variables(current_state, csp)
+            result = table.state(current_state) # return current_state
+            break
+        if budget is not None and not budget.spend():
+            break
         # set var ← a randomly chosen variable from the set of conflicted variables CONFLICTED[csp]
-        var = random.choice(conflicted)            
+        var = random.choice(table.conflicted)
         # set value ← the value v for var that minimizes CONFLICTS(var,v,current_state,csp)
-        value = conflicts(csp.get_node(var), current_state, csp)[0]
+        value = choose_value(table, var, i, tabu, options)
         # set var ← value in current_state
-        current_state[var] = value
-    return False
+        if value != table.colors[var]:
+            flips += 1
+            if options.tabu_tenure:
+                tabu[var * csp.k + table.colors[var]] = i + options.tabu_tenure
+        table.assign(var, value)
+    if csp.stats is not None:
+        csp.stats.nodes += steps - first
+        csp.stats.flips += flips
+    return result
 
 # algorithm MIN-CONFLICTS is
 #     input: csp, A constraint satisfaction problem.
@@ -144,64 +252,177 @@ def min_conflicts(csp, max_steps, current_state):
 
 #     return failure
 
-def min_conflicts_solver(csp):
+def budget_message(budget):
+    if budget.exhausted == "time":
+        return "around {} seconds have past".format(budget.seconds)
+    return "{} steps have past".format(budget.count)
+
+def min_conflicts_solver(csp, options=None, budget=None):
+    # trials until a solution is found or the budget (by default about 60 seconds) runs out,
+    # the state with the fewest conflicts over all trials is kept in budget.best
     global steps
+    if options is None:
+        options = MinConflictsOptions()
+    if budget is None:
+        budget = Budget(seconds=60)
     trial = 0
-    start = datetime.datetime.now()
-    assignment = False
-    expire = False
-    while (not assignment or expire): # and time_elapsed < 60 seconds
+    table = None
+    while True:
         trial += 1
         print("trial", trial)
-        assignment = min_conflicts(csp, 1000, random_state(csp))
-        end = datetime.datetime.now()
-        time_elapsed = (end - start)
-        if time_elapsed > datetime.timedelta(seconds=60):
-            print("around 60 seconds have past")
-            expire = True
+        if options.restart or table is None:
+            state = random_state(csp)
+            table = ConflictTable(csp, state)
+            if csp.stats is not None and trial > 1:
+                csp.stats.restarts += 1
+        else:
+            table.restore_best() # keep stepping from the best state instead of restarting
+        assignment = min_conflicts(csp, options.max_steps, state, options, table, budget)
+        if assignment:
+            global steps_list
+            steps_list.append(steps)
+            return assignment
+        if budget.better(table.best_total):
+            table.restore_best()
+            budget.improve(table.state({}), table.best_total)
+        if budget.exhausted or not budget.tick():
+            print(budget_message(budget))
             return False
-    if assignment:
-        global steps_list
-        steps_list.append(steps)
-    return assignment
+
+# -------------------------------------------------------
+### parallel restarts ###
+
+# the csp each pool worker solves, set once per worker by init_worker
+# with the fork start method the workers share the parent's graph (copy-on-write), nothing is pickled per task
+global shared_csp
+shared_csp = None
+
+def init_worker(csp):
+    global shared_csp
+    shared_csp = csp
+
+def restart_worker(seed, max_steps, options=None):
+    # one independent seeded restart, returns (seed, solution or False, steps taken, flips, best)
+    # best is (conflicts, colors) of the best state of a failed restart
+    global steps
+    steps = 0
+    shared_csp.stats = Stats() # this restart's counters, the flips are added to the parent's stats
+    random.seed(seed)
+    state = random_state(shared_csp)
+    table = ConflictTable(shared_csp, state)
+    assignment = min_conflicts(shared_csp, max_steps, state, options, table)
+    best = None
+    if not assignment:
+        table.restore_best()
+        best = (table.best_total, table.colors)
+    return seed, assignment, steps, shared_csp.stats.flips, best
+
+def pool_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+def parallel_min_conflicts_solver(csp, processes=None, seconds=60, max_steps=1000, seed=None, options=None, budget=None):
+    # runs independent seeded restarts on a process pool sized to the machine
+    # the first solution terminates the pool, cancelling the remaining restarts
+    # budget, when given, replaces seconds; the workers' steps are charged to it as their restarts finish
+    # an exception in a restart is raised here
+    global steps
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2**32)
+    if budget is None:
+        budget = Budget(seconds=seconds)
+    seeds = itertools.count(seed)
+    results = queue.Queue()
+    steps = 0
+    with pool_context().Pool(processes, initializer=init_worker, initargs=(csp,)) as pool:
+        # keep two restarts queued per worker so no worker waits for the next task
+        for i in range(2 * processes):
+            pool.apply_async(restart_worker, (next(seeds), max_steps, options), callback=results.put, error_callback=results.put)
+        trial = 0
+        while budget.tick():
+            # wake up at least every interval for the progress callback, and at the time limit
+            timeout = budget.interval
+            if budget.seconds is not None:
+                timeout = max(0, min(timeout, budget.seconds - budget.elapsed()))
+            try:
+                result = results.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if isinstance(result, Exception): # a failed restart, error_callback puts its exception
+                raise result
+            restart_seed, assignment, worker_steps, worker_flips, best = result
+            trial += 1
+            steps += worker_steps
+            budget.count += worker_steps
+            if csp.stats is not None:
+                csp.stats.nodes += worker_steps
+                csp.stats.flips += worker_flips
+                if trial > 1: # as in min_conflicts_solver, the first trial is not a restart
+                    csp.stats.restarts += 1
+            if best and budget.better(best[0]):
+                budget.improve(dict(enumerate(best[1])), best[0])
+            if assignment:
+                print("trial", trial, "seed", restart_seed)
+                global steps_list
+                steps_list.append(steps)
+                return assignment
+            pool.apply_async(restart_worker, (next(seeds), max_steps, options), callback=results.put, error_callback=results.put)
+    print(budget_message(budget))
+    return False
 
 # -------------------------------------------------------
 
 # writes the solution assignment to the output file
-def write_output(assignment, file):
-    if (assignment):
-        f = open(file, "w")
-        for i in sorted(assignment): 
-            color = str(assignment[i])
-            f.write(color)
-            if not i == sorted(assignment)[-1]:
-                f.write("\n")
-        f.close()
-        return True
-    else:
-        f = open(file, "w")
-        f.write("No answer")
-        f.close()
-        return False
+def write_output(assignment, file): # "No answer" when there is no solution
+    return write_solution(assignment, file)
 
 ### Main class ###
 
 if __name__ == '__main__':
-    # python minconicts.py <INPUT FILE> <OUTPUT FILE>.
+    # python minconicts.py <INPUT FILE> <OUTPUT FILE> [<MODE FLAG>].
+    # <MODE FLAG> can be either 0 (sequential restarts, default), 1 (parallel restarts on all cores)
+    # 2 (NumPy engine, needs numpy) or 3 (tabu search with random walk, continuing from the best state).
+    # --profile prints the solve statistics as JSON, --cprofile[=FILE] runs the search under cProfile.
     
     # (sys.argv[0]) # minconicts.py
     input = (sys.argv[1]) # INPUT FILE PATH
     output = (sys.argv[2]) # OUTPUT FILE PATH
+    arguments = [arg for arg in sys.argv[3:] if not arg.startswith("--")]
+    mode = arguments[0] if arguments else '0' # MODE FLAG
+    profile, cprofile, cprofile_file = profile_flags(sys.argv[3:])
 
     start = datetime.datetime.now()
 
-    csp = input_to_csp(input)
+    stats = Stats()
+    with stats.phase("parse"):
+        csp = input_to_csp(input)
+    if profile:
+        csp.stats = stats
     assignment = []
 
-    assignment = min_conflicts_solver(csp)
+    if (mode == '1'): # parallel restarts
+        search, args = parallel_min_conflicts_solver, (csp,)
+    elif (mode == '2'): # NumPy engine
+        import minconflicts_numpy
+        search, args = minconflicts_numpy.min_conflicts_solver, (csp,)
+    elif (mode == '3'): # tabu search with random walk
+        search, args = min_conflicts_solver, (csp, TABU_OPTIONS)
+    else:
+        search, args = min_conflicts_solver, (csp,)
+    with stats.phase("search"):
+        if cprofile:
+            assignment = run_profiled(search, args, cprofile_file)
+        else:
+            assignment = search(*args)
 
     # write to output file
-    write_output(assignment, output)
+    with stats.phase("write"):
+        write_output(assignment, output)
+    if profile:
+        print(stats.to_json())
 
     end = datetime.datetime.now()
     time_elapsed = (end - start)
@@ -209,38 +430,3 @@ if __name__ == '__main__':
     # print("constraints", csp.constraints)
     # print("result", assignment)
     print("time elapsed", time_elapsed)
-
-    '''
-    times = []
-
-    for i in range(20):
-        print("test", i)
-        steps = 0
-        # state = CSPGenerator(20, 100, 4, "parameter_set") # N M K
-        # state = CSPGenerator(50, 625, 4, "parameter_set") # N M K
-        # state = CSPGenerator(100, 2500, 4, "parameter_set") # N M K
-        # state = CSPGenerator(200, 10000, 4, "parameter_set") # N M K
-        state = CSPGenerator(400, 40000, 4, "parameter_set") # N M K
-        start = datetime.datetime.now()
-        csp = input_to_csp("parameter_set")
-        assignment = []
-        assignment = min_conflicts_solver(csp)
-        write_output(assignment, "output")
-        end = datetime.datetime.now()
-        time_elapsed = (end - start) * 1000.0 # milliseconds
-        print(time_elapsed)
-        times.append(time_elapsed.total_seconds())
-        print("---")
-    print(steps_list)
-    x = steps_list
-    mean = sum(x) / len(x)
-    print("mean states", mean)
-    sd = math.sqrt(sum([(val - mean)**2 for val in x])/(len(x) - 1))
-    print("sd states", sd)
-    # print("times", times)
-    x = times
-    mean = sum(x) / len(x)
-    print("mean times", mean)
-    sd = math.sqrt(sum([(val - mean)**2 for val in x])/(len(x) - 1))
-    print("sd times", sd)
-    '''
\ No newline at end of file
@@ -0,0 +1,185 @@
+import sys
+import random
+import datetime
+import numpy as np
+import minconflicts
+from budget import Budget
+from loader import input_to_csp
+
+# -------------------------------------------------------
+# NumPy-backed min-conflicts (needs numpy, the other solvers do not)
+# the assignment is an int array and the constraints two index arrays,
+# conflicts and the per-color neighbor histograms are computed with bincount,
+# and moves are drawn in batches from one conflict snapshot, a large batch applied
+# at once with one np.add.at, a small one (few conflicts left) move by move
+# -------------------------------------------------------
+
+global steps
+steps = 0
+
+# batches of at least this many variables are applied with one np.add.at (apply_batch);
+# below it the numpy calls of a whole batch cost more than a few single moves
+VECTOR_BATCH = 32
+
+class VectorCSP:
+    # array form of a csp, built once per instance
+    def __init__(self, csp):
+        self.n = csp.n
+        self.k = csp.k
+        edges = np.array(csp.edges, dtype=np.int64)
+        self.u = edges[0::2]
+        self.v = edges[1::2]
+        # one neighbor entry per constraint end, a self-loop only once (same as csp.adjacency)
+        loops = self.u == self.v
+        self.heads = np.concatenate([self.u, self.v[~loops]])
+        self.tails = np.concatenate([self.v, self.u[~loops]])
+        order = np.argsort(self.heads, kind='stable')
+        self.indices = self.tails[order] # CSR neighbors
+        self.indptr = np.zeros(self.n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.heads, minlength=self.n), out=self.indptr[1:])
+        self.ids = np.arange(self.n)
+        self.rank = np.full(self.n, -1, dtype=np.int64) # position of each variable in a batch, -1 outside (apply_batch)
+        self.stats = csp.stats
+
+    def histograms(self, assign):
+        # hist[i][c] = number of neighbors of i assigned color c
+        keys = self.heads * self.k + assign[self.tails]
+        return np.bincount(keys, minlength=self.n * self.k).reshape(self.n, self.k)
+
+    def conflict_vector(self, assign): # conflicted[e] = constraint e is violated
+        return assign[self.u] == assign[self.v]
+
+    def conflicted_variables(self, assign, hist):
+        return np.flatnonzero(hist[self.ids, assign] > 0)
+
+def random_state(vcsp, rng):
+    return rng.integers(0, vcsp.k, size=vcsp.n)
+
+def apply_batch(vcsp, hist, assign, sample):
+    # moves the variables of sample together: one adjacent to a variable before it in sample
+    # waits for a later batch, so the moves left do not change each other's histograms (the same
+    # result as making them one after the other) and all neighbor updates are one np.add.at
+    # returns (moves, flips)
+    size = len(sample)
+    k = vcsp.k
+    indptr = vcsp.indptr
+    # neighbors of the sampled variables, owners[j] = position in sample of the variable of neighbors[j]
+    starts = indptr[sample]
+    counts = indptr[sample + 1] - starts
+    owners = np.repeat(np.arange(size), counts)
+    neighbors = vcsp.indices[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+    rank = vcsp.rank
+    rank[sample] = np.arange(size)
+    before = rank[neighbors]
+    rank[sample] = -1
+    keep = np.ones(size, dtype=bool)
+    keep[owners[(before >= 0) & (before < owners)]] = False # a neighbor comes earlier in sample
+    old = assign[sample]
+    value = hist[sample].argmin(axis=1)
+    moving = keep & (value != old)
+    flips = int(moving.sum())
+    if flips:
+        changed = moving[owners]
+        rows = neighbors[changed] * k
+        owner = owners[changed]
+        keys = np.concatenate([rows + old[owner], rows + value[owner]])
+        deltas = np.ones(len(keys), dtype=hist.dtype)
+        deltas[:len(rows)] = -1
+        np.add.at(hist.reshape(-1), keys, deltas) # hist[i][c] is hist.reshape(-1)[i * k + c]
+        assign[sample[moving]] = value[moving]
+    return int(keep.sum()), flips
+
+def min_conflicts(vcsp, max_steps, assign, rng, batch=64, budget=None):
+    # same step as minconflicts.min_conflicts: a random conflicted variable moves to its
+    # least conflicting color (lowest color on ties); up to batch moves share one snapshot
+    # of the conflicted variables; a batch of at least VECTOR_BATCH variables is applied at
+    # once by apply_batch, a smaller one move by move, a variable fixed by an earlier move skipped
+    # budget, when given, is charged once per batch and ends the trial once it runs out
+    global steps
+    hist = vcsp.histograms(assign)
+    indices = vcsp.indices
+    indptr = vcsp.indptr
+    moves = 0
+    while moves < max_steps:
+        conflicted = vcsp.conflicted_variables(assign, hist)
+        if len(conflicted) == 0: # current state is a solution of csp
+            print(steps)
+            return assign
+        size = min(batch, len(conflicted), max_steps - moves)
+        if budget is not None and not budget.spend(size):
+            break
+        sample = rng.choice(conflicted, size=size, replace=False)
+        if size >= VECTOR_BATCH:
+            moved, flips = apply_batch(vcsp, hist, assign, sample)
+            moves += moved
+            steps += moved
+            if vcsp.stats is not None:
+                vcsp.stats.flips += flips
+            continue
+        for var in sample.tolist():
+            old = assign[var]
+            if hist[var, old] == 0:
+                continue
+            moves += 1
+            steps += 1
+            value = int(hist[var].argmin())
+            if value != old:
+                if vcsp.stats is not None:
+                    vcsp.stats.flips += 1
+                neighbors = indices[indptr[var]:indptr[var+1]]
+                np.add.at(hist, (neighbors, old), -1)
+                np.add.at(hist, (neighbors, value), 1)
+                assign[var] = value
+    if not vcsp.conflict_vector(assign).any():
+        print(steps)
+        return assign
+    return False
+
+def min_conflicts_solver(csp, max_steps=1000, seconds=60, budget=None):
+    # restarts from random states until a solution is found or about 60 seconds have past
+    # (or budget runs out), like minconflicts.min_conflicts_solver
+    # the final state of a failed trial is offered to budget.best
+    vcsp = VectorCSP(csp)
+    rng = np.random.default_rng(random.randrange(2**32))
+    if budget is None:
+        budget = Budget(seconds=seconds)
+    trial = 0
+    while True:
+        trial += 1
+        print("trial", trial)
+        assign = random_state(vcsp, rng)
+        first = steps
+        solution = min_conflicts(vcsp, max_steps, assign, rng, budget=budget)
+        if csp.stats is not None:
+            csp.stats.nodes += steps - first
+            if trial > 1:
+                csp.stats.restarts += 1
+        if solution is not False:
+            minconflicts.steps_list.append(steps)
+            return dict(enumerate(solution.tolist()))
+        hist = vcsp.histograms(assign)
+        conflicts = int(hist[vcsp.ids, assign].sum())
+        if budget.better(conflicts):
+            budget.improve(dict(enumerate(assign.tolist())), conflicts)
+        if budget.exhausted or not budget.tick():
+            print(minconflicts.budget_message(budget))
+            return False
+
+### Main class ###
+
+if __name__ == '__main__':
+    # python minconflicts_numpy.py <INPUT FILE> <OUTPUT FILE>
+    input = (sys.argv[1]) # INPUT FILE PATH
+    output = (sys.argv[2]) # OUTPUT FILE PATH
+
+    start = datetime.datetime.now()
+
+    csp = input_to_csp(input)
+    assignment = min_conflicts_solver(csp)
+
+    # write to output file
+    minconflicts.write_output(assignment, output)
+
+    end = datetime.datetime.now()
+    time_elapsed = (end - start)
+    print("time elapsed", time_elapsed)
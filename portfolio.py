@@ -0,0 +1,112 @@
+import os
+import sys
+import queue
+import random
+import datetime
+import dfsb
+import minconflicts
+from loader import input_to_csp
+
+# -------------------------------------------------------
+# portfolio solver
+# races improved DFS-B against differently seeded min-conflicts workers,
+# each engine in its own process, on an instance loaded once
+# the first verified solution wins, a failed DFS-B proves the csp has no solution
+# -------------------------------------------------------
+
+# a worker puts (engine, solution or False) on results, or (engine, exception) when it fails,
+# so the portfolio never waits for a worker that has died
+
+def dfsb_worker(csp, results):
+    try:
+        assignment = dfsb.improved_backtracking_search(csp)
+    except Exception as error:
+        assignment = error
+    results.put(("dfsb", assignment))
+
+def min_conflicts_worker(csp, results, seed, max_steps):
+    # independent restarts until the portfolio stops this process
+    engine = "minconflicts seed {}".format(seed)
+    try:
+        random.seed(seed)
+        while True:
+            assignment = minconflicts.min_conflicts(csp, max_steps, minconflicts.random_state(csp))
+            if assignment:
+                results.put((engine, assignment))
+                return
+    except Exception as error:
+        results.put((engine, error))
+
+def portfolio_solver(csp, processes=None, seconds=None, max_steps=1000, seed=None):
+    # returns (engine, assignment)
+    # assignment is False with engine "dfsb" when the csp is proven unsatisfiable,
+    # and False with engine None when the time budget ran out
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2**32)
+    context = minconflicts.pool_context()
+    results = context.Queue()
+    workers = [context.Process(target=dfsb_worker, args=(csp, results))]
+    for i in range(max(processes - 1, 1)):
+        workers.append(context.Process(target=min_conflicts_worker, args=(csp, results, seed + i, max_steps)))
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+
+    start = datetime.datetime.now()
+    engine, assignment = None, False
+    try:
+        while True:
+            timeout = None
+            if seconds is not None:
+                timeout = seconds - (datetime.datetime.now() - start).total_seconds()
+                if timeout <= 0:
+                    break
+            try:
+                engine, assignment = results.get(timeout=timeout)
+            except queue.Empty:
+                engine, assignment = None, False
+                break
+            if isinstance(assignment, Exception): # the workers are stopped on the way out
+                raise assignment
+            if not assignment: # dfsb searched the whole tree
+                break
+            if minconflicts.is_complete(assignment, csp): # verify before accepting
+                break
+            print("rejected invalid solution from", engine)
+            engine, assignment = None, False
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+    return engine, assignment
+
+### Main class ###
+
+if __name__ == '__main__':
+    # python portfolio.py <INPUT FILE> <OUTPUT FILE> [<PROCESSES>]
+    input = (sys.argv[1]) # INPUT FILE PATH
+    output = (sys.argv[2]) # OUTPUT FILE PATH
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None # number of engine processes
+
+    start = datetime.datetime.now()
+
+    csp = input_to_csp(input)
+    engine, assignment = portfolio_solver(csp, processes)
+
+    if assignment:
+        print("solved by", engine)
+    elif engine:
+        print("no solution (proved by {})".format(engine))
+    else:
+        print("no solution found")
+
+    # write to output file
+    minconflicts.write_output(assignment, output)
+
+    end = datetime.datetime.now()
+    time_elapsed = (end - start)
+    print("time elapsed", time_elapsed)
@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+import datetime
+from array import array
+import dfsb
+import minconflicts
+from CSP import CSP
+from loader import input_to_csp
+from stats import Stats
+
+# -------------------------------------------------------
+# graph preprocessing before the solvers
+# 1. a self-loop, or a clique with more than K variables, proves there is no solution
+# 2. variables with fewer than K distinct neighbors are peeled off repeatedly,
+#    they can always be colored after the rest (in reverse peeling order)
+# 3. what is left (the K-core) is split into connected components,
+#    each is solved on its own, on a process pool when there are several
+# -------------------------------------------------------
+
+# engine flag -> solver(csp) returning an assignment or False
+ENGINES = {
+    '0': dfsb.plain_backtracking_search,
+    '1': dfsb.improved_backtracking_search,
+    '2': minconflicts.min_conflicts_solver,
+    '3': lambda csp: minconflicts.min_conflicts_solver(csp, minconflicts.TABU_OPTIONS),
+}
+
+def distinct_neighbors(csp): # neighbor id sets, repeated constraints counted once
+    return [set(neighbor.id for neighbor in csp.get_neighbors(node)) for node in csp.variables]
+
+def peel(csp, neighbors):
+    # removes variables with fewer than K remaining neighbors until none is left
+    # returns the peeled variables in removal order and the remaining core
+    degree = [len(ids) for ids in neighbors]
+    removed = [False] * csp.n
+    order = []
+    stack = [v for v in range(csp.n) if degree[v] < csp.k and v not in neighbors[v]]
+    while stack:
+        v = stack.pop()
+        removed[v] = True
+        order.append(v)
+        for u in neighbors[v]:
+            if not removed[u]:
+                degree[u] -= 1
+                if degree[u] == csp.k - 1 and u not in neighbors[u]:
+                    stack.append(u)
+    core = [v for v in range(csp.n) if not removed[v]]
+    return order, core
+
+def components(core, neighbors):
+    # connected components of the subgraph induced by the core variables
+    in_core = set(core)
+    seen = set()
+    result = []
+    for start in core:
+        if start in seen:
+            continue
+        seen.add(start)
+        component = [start]
+        stack = [start]
+        while stack:
+            v = stack.pop()
+            for u in neighbors[v]:
+                if u in in_core and u not in seen:
+                    seen.add(u)
+                    component.append(u)
+                    stack.append(u)
+        result.append(sorted(component))
+    return result
+
+def greedy_clique(vertices, neighbors, tries=16):
+    # grows a clique from each of the highest degree vertices, always adding the
+    # candidate with the most neighbors, returns the largest clique found
+    best = []
+    allowed = set(vertices)
+    starts = sorted(vertices, key=lambda v: len(neighbors[v]), reverse=True)[:tries]
+    for start in starts:
+        clique = [start]
+        candidates = (neighbors[start] & allowed) - {start}
+        while candidates:
+            v = max(candidates, key=lambda u: len(neighbors[u]))
+            clique.append(v)
+            candidates = (candidates & neighbors[v]) - {v}
+        if len(clique) > len(best):
+            best = clique
+    return best
+
+def subproblem(csp, vertices):
+    # the csp induced by vertices, renumbered 0 to len(vertices)-1 in order
+    index = {}
+    for i, v in enumerate(vertices):
+        index[v] = i
+    edges = array('i')
+    for v in vertices:
+        for neighbor in csp.adjacency[v]:
+            u = neighbor.id
+            if v <= u and u in index: # each constraint once, from its lower end
+                edges.append(index[v])
+                edges.append(index[u])
+    return CSP(len(vertices), len(edges) // 2, csp.k, edges)
+
+def extend(csp, assignment, order):
+    # colors the peeled variables, last peeled first; each had fewer than K neighbors
+    # left when it was peeled, so a free color always exists
+    for v in reversed(order):
+        used = set()
+        for neighbor in csp.adjacency[v]:
+            if neighbor.id in assignment:
+                used.add(assignment[neighbor.id])
+        for color in range(csp.k):
+            if color not in used:
+                assignment[v] = color
+                break
+    return assignment
+
+def solve_component(task):
+    engine, sub = task
+    return ENGINES[engine](sub)
+
+def preprocess(csp):
+    # returns (report, peeling order, core components), report["unsatisfiable"] says why there is no solution
+    neighbors = distinct_neighbors(csp)
+    report = {}
+    loops = [v for v in range(csp.n) if v in neighbors[v]]
+    if loops:
+        report["unsatisfiable"] = "variable {} is constrained with itself".format(loops[0])
+        return report, None, None
+
+    order, core = peel(csp, neighbors)
+    report["peeled"] = len(order)
+    report["core"] = len(core)
+    clique = greedy_clique(core, neighbors)
+    report["clique"] = len(clique)
+    if len(clique) > csp.k:
+        report["unsatisfiable"] = "clique of {} variables {} needs more than {} colors".format(len(clique), sorted(clique), csp.k)
+        return report, None, None
+
+    parts = components(core, neighbors)
+    report["components"] = len(parts)
+    return report, order, parts
+
+def preprocessed_solve(csp, engine='1', processes=None):
+    # returns (assignment or False, report of what the preprocessing found)
+    # with csp.stats the preprocess and search phases are timed, and the
+    # sequentially solved components count into it
+    start = time.perf_counter()
+    report, order, parts = preprocess(csp)
+    tasks = []
+    if parts is not None:
+        tasks = [(engine, subproblem(csp, vertices)) for vertices in parts]
+    if csp.stats is not None:
+        csp.stats.phases["preprocess"] = time.perf_counter() - start
+    if "unsatisfiable" in report:
+        return False, report
+    start = time.perf_counter()
+    result = solve_parts(csp, order, parts, tasks, report, processes)
+    if csp.stats is not None:
+        csp.stats.phases["search"] = time.perf_counter() - start
+    return result
+
+def solve_parts(csp, order, parts, tasks, report, processes):
+    # solves the component tasks and colors the peeled variables
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(tasks))
+
+    assignment = {}
+    if processes > 1:
+        with minconflicts.pool_context().Pool(processes) as pool:
+            solutions = pool.imap(solve_component, tasks)
+            for vertices, solution in zip(parts, solutions):
+                if not solution: # the pool is terminated on exit
+                    return False, report
+                for i, v in enumerate(vertices):
+                    assignment[v] = solution[i]
+    else:
+        for vertices, task in zip(parts, tasks):
+            task[1].stats = csp.stats
+            solution = solve_component(task)
+            if not solution:
+                return False, report
+            for i, v in enumerate(vertices):
+                assignment[v] = solution[i]
+    return extend(csp, assignment, order), report
+
+### Main class ###
+
+if __name__ == '__main__':
+    # python preprocess.py <INPUT FILE> <OUTPUT FILE> <ENGINE FLAG> [<PROCESSES>]
+    # <ENGINE FLAG>: 0 plain DFS-B, 1 improved DFS-B, 2 min-conflicts, 3 min-conflicts with tabu search
+    # --profile prints the solve statistics as JSON (components solved on a pool are not counted)
+    input = (sys.argv[1]) # INPUT FILE PATH
+    output = (sys.argv[2]) # OUTPUT FILE PATH
+    engine = (sys.argv[3]) # ENGINE FLAG
+    arguments = [arg for arg in sys.argv[4:] if not arg.startswith("--")]
+    processes = int(arguments[0]) if arguments else None # number of component processes
+    profile = "--profile" in sys.argv[4:]
+
+    start = datetime.datetime.now()
+
+    stats = Stats()
+    with stats.phase("parse"):
+        csp = input_to_csp(input)
+    if profile:
+        csp.stats = stats
+    assignment, report = preprocessed_solve(csp, engine, processes)
+    print(report)
+
+    # write to output file
+    with stats.phase("write"):
+        minconflicts.write_output(assignment, output)
+    if profile:
+        print(stats.to_json())
+
+    end = datetime.datetime.now()
+    time_elapsed = (end - start)
+    print("time elapsed", time_elapsed)
@@ -0,0 +1,163 @@
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+from array import array
+import anytime
+import minconflicts
+from CSP import CSP
+from loader import check_instance, input_to_csp
+
+# -------------------------------------------------------
+# library API and batch mode: many instances solved in one process
+# (no interpreter start, import or output file per instance)
+#
+#   import solver
+#   result = solver.solve_edges(3, 3, [(0, 1), (1, 2)], engine="improved", seconds=5)
+#   result.assignment -> {0: 0, 1: 1, 2: 0} or False, result.status, result.states, ...
+#
+# batch mode reads instance paths from the command line, or instance frames
+# (the text input format, one instance after another) from stdin with "-",
+# and prints one JSON line per instance in input order
+#
+# python solver.py [--engine E] [--seconds S] [--nodes N] [--processes P] [--colors] <PATH> ... | -
+# -------------------------------------------------------
+
+class Result:
+    # outcome of one solve
+    def __init__(self, name, assignment, best, report, parse_seconds=0.0):
+        self.name = name # path or frame number of the instance
+        self.assignment = assignment # solution dict variable -> color, or False
+        self.best = best # best partial assignment (see anytime.py)
+        self.status = report["status"] # "solved", "unsatisfiable" or "budget"
+        self.engine = report["engine"]
+        self.states = report["states"] # DFS-B nodes or min-conflicts steps
+        self.conflicts = report["conflicts"] # of best
+        self.unassigned = report["unassigned"] # of best
+        self.search_seconds = report["elapsed"]
+        self.parse_seconds = parse_seconds
+
+    def colors(self): # the solution as a list of colors in variable order, or None
+        if not self.assignment:
+            return None
+        return [self.assignment[v] for v in range(len(self.assignment))]
+
+    def to_dict(self, colors=False):
+        result = {
+            "instance": self.name, "status": self.status, "engine": self.engine,
+            "states": self.states, "conflicts": self.conflicts, "unassigned": self.unassigned,
+            "parse_seconds": self.parse_seconds, "search_seconds": self.search_seconds,
+        }
+        if colors:
+            result["colors"] = self.colors()
+        return result
+
+def make_csp(n, k, edges):
+    # csp from an in-memory constraint list, (u, v) pairs or a flat sequence u0 v0 u1 v1 ...
+    flat = array('i')
+    for edge in edges:
+        if isinstance(edge, int):
+            flat.append(edge)
+        else:
+            u, v = edge
+            flat.append(u)
+            flat.append(v)
+    check_instance("edges", n, len(flat) // 2, k, flat)
+    return CSP(n, len(flat) // 2, k, flat)
+
+def solve_csp(csp, engine="improved", seconds=None, nodes=None, callback=None, quiet=True, name=None, parse_seconds=0.0):
+    # quiet discards the solvers' progress output
+    if quiet:
+        with contextlib.redirect_stdout(io.StringIO()):
+            assignment, best, report = anytime.solve(csp, engine, seconds, nodes, callback)
+    else:
+        assignment, best, report = anytime.solve(csp, engine, seconds, nodes, callback)
+    return Result(name, assignment, best, report, parse_seconds)
+
+def solve_edges(n, k, edges, engine="improved", seconds=None, nodes=None, callback=None, quiet=True, name=None):
+    start = time.perf_counter()
+    csp = make_csp(n, k, edges)
+    return solve_csp(csp, engine, seconds, nodes, callback, quiet, name, time.perf_counter() - start)
+
+def solve_file(path, engine="improved", seconds=None, nodes=None, callback=None, quiet=True):
+    start = time.perf_counter()
+    csp = input_to_csp(path)
+    return solve_csp(csp, engine, seconds, nodes, callback, quiet, path, time.perf_counter() - start)
+
+# -------------------------------------------------------
+### batch mode ###
+
+def read_tokens(stream):
+    for line in stream:
+        for token in line.split():
+            yield int(token)
+
+def read_frames(stream):
+    # instances in the text input format, one after another; yields (frame number, n, k, edges)
+    numbers = read_tokens(stream)
+    frame = 0
+    for n in numbers:
+        try:
+            m = next(numbers)
+            k = next(numbers)
+            edges = array('i')
+            for i in range(2 * m):
+                edges.append(next(numbers))
+        except StopIteration:
+            raise ValueError("frame {}: input ends inside the instance".format(frame))
+        yield frame, n, k, edges
+        frame += 1
+
+def solve_task(task):
+    # one batch instance: (path, engine, seconds, nodes) or ((frame, n, k, edges), engine, seconds, nodes)
+    instance, engine, seconds, nodes = task
+    try:
+        if isinstance(instance, str):
+            return solve_file(instance, engine, seconds, nodes)
+        frame, n, k, edges = instance
+        return solve_edges(n, k, edges, engine, seconds, nodes, name=frame)
+    except (OSError, ValueError) as error: # a bad instance does not stop the batch
+        return error
+
+def solve_many(instances, engine="improved", seconds=None, nodes=None, processes=1):
+    # yields a Result (or the OSError / ValueError of a bad instance) per instance, in order
+    # instances are paths or (name, n, k, edges) tuples; processes > 1 solves them on a pool
+    tasks = ((instance, engine, seconds, nodes) for instance in instances)
+    if processes <= 1:
+        for task in tasks:
+            yield solve_task(task)
+        return
+    if engine in ("minconflicts-parallel", "improved-parallel"):
+        raise ValueError("{} starts its own worker processes, use processes=1".format(engine))
+    with minconflicts.pool_context().Pool(processes) as pool:
+        for result in pool.imap(solve_task, tasks):
+            yield result
+
+### Main class ###
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="solve many instances in one process, one JSON line each")
+    parser.add_argument("instances", nargs="+", help="instance paths, or - to read instance frames from stdin")
+    parser.add_argument("--engine", choices=sorted(anytime.ENGINES), default="improved")
+    parser.add_argument("--seconds", type=float, default=None, help="wall-clock budget per instance")
+    parser.add_argument("--nodes", type=int, default=None, help="states / steps budget per instance")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes")
+    parser.add_argument("--colors", action="store_true", help="include the solution colors in the output")
+    args = parser.parse_args()
+
+    if args.instances == ["-"]:
+        instances = read_frames(sys.stdin)
+    else:
+        instances = args.instances
+    try:
+        for result in solve_many(instances, args.engine, args.seconds, args.nodes, args.processes):
+            if isinstance(result, Exception):
+                print(json.dumps({"error": str(result)}))
+            else:
+                print(json.dumps(result.to_dict(args.colors)))
+            sys.stdout.flush()
+    except ValueError as error: # a truncated stdin frame ends the batch
+        print(json.dumps({"error": str(error)}))
+        sys.exit(1)
@@ -0,0 +1,73 @@
+import sys
+import json
+import time
+import pstats
+import cProfile
+import contextlib
+
+# -------------------------------------------------------
+# per-solve statistics and the --profile / --cprofile command line flags
+# the solvers count into csp.stats when it is a Stats object; when it is None (the default)
+# the counting costs one check per propagation call or trial, the hot loops use local counters
+# -------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self.nodes = 0 # DFS-B states, or min-conflicts steps
+        self.backtracks = 0 # DFS-B dead ends (a backjump counts once)
+        self.revisions = 0 # AC3 arc revisions (remove_inconsistent_values calls)
+        self.prunes = 0 # values removed by forward checking
+        self.flips = 0 # min-conflicts steps that changed a color
+        self.restarts = 0 # min-conflicts trials started from a new random state
+        self.phases = {} # phase name -> seconds, e.g. parse, preprocess, search, write
+
+    @contextlib.contextmanager
+    def phase(self, name): # with stats.phase("search"): ...
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def add(self, other): # adds the counters of another Stats, e.g. one kept in a worker process
+        self.nodes += other.nodes
+        self.backtracks += other.backtracks
+        self.revisions += other.revisions
+        self.prunes += other.prunes
+        self.flips += other.flips
+        self.restarts += other.restarts
+
+    def to_dict(self):
+        return {
+            "nodes": self.nodes, "backtracks": self.backtracks, "revisions": self.revisions,
+            "prunes": self.prunes, "flips": self.flips, "restarts": self.restarts,
+            "phases": dict(self.phases),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+def profile_flags(flags):
+    # --profile: print the stats as JSON at the end of the run
+    # --cprofile or --cprofile=FILE: run the search under cProfile, print the top functions
+    # (or dump the pstats data to FILE); returns (profile, cprofile, cprofile file or None)
+    profile = "--profile" in flags
+    cprofile = False
+    file = None
+    for flag in flags:
+        if flag == "--cprofile":
+            cprofile = True
+        elif flag.startswith("--cprofile="):
+            cprofile = True
+            file = flag.split("=", 1)[1]
+    return profile, cprofile, file
+
+def run_profiled(function, args, file=None, top=25):
+    # function(*args) under cProfile
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args)
+    if file:
+        profiler.dump_stats(file)
+    else:
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(top)
+    return result
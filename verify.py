@@ -0,0 +1,57 @@
+import sys
+from loader import read_edges, read_solution
+
+# -------------------------------------------------------
+# solution verifier, O(N+M): checks a solution file against an instance file
+# without solving (the compiled sidecar is used when there is one)
+#
+# python verify.py <INPUT FILE> <SOLUTION FILE>
+# prints OK and exits with 0 when every variable has a color in 0 to K-1 and no
+# constraint joins two variables of the same color, otherwise prints the first
+# problems found and exits with 1 ("No answer" also exits with 1)
+# -------------------------------------------------------
+
+def verify(n, k, edges, colors, limit=10):
+    # returns (number of problems, messages for the first limit of them)
+    problems = 0
+    messages = []
+    if len(colors) != n:
+        problems += 1
+        if len(messages) < limit:
+            messages.append("{} colors for {} variables".format(len(colors), n))
+    for v in range(min(n, len(colors))):
+        if not 0 <= colors[v] < k:
+            problems += 1
+            if len(messages) < limit:
+                messages.append("variable {} has color {} outside 0 to {}".format(v, colors[v], k - 1))
+    count = min(n, len(colors))
+    for i in range(0, len(edges), 2):
+        u = edges[i]
+        v = edges[i+1]
+        if u < count and v < count and colors[u] == colors[v]:
+            problems += 1
+            if len(messages) < limit:
+                messages.append("constraint {} ({} {}) has color {} on both variables".format(i // 2, u, v, colors[u]))
+    return problems, messages
+
+def verify_files(input, solution):
+    n, m, k, edges = read_edges(input)
+    colors = read_solution(solution)
+    if colors is None:
+        return 1, ["{}: No answer".format(solution)]
+    return verify(n, k, edges, colors)
+
+### Main class ###
+
+if __name__ == '__main__':
+    input = (sys.argv[1]) # INPUT FILE PATH
+    solution = (sys.argv[2]) # SOLUTION FILE PATH
+    problems, messages = verify_files(input, solution)
+    if not problems:
+        print("OK")
+        sys.exit(0)
+    for message in messages:
+        print(message)
+    if problems > len(messages):
+        print("... {} problems in total".format(problems))
+    sys.exit(1)